@@ -1,29 +1,231 @@
-from flask import Flask, render_template, jsonify, request
+from flask import Flask, Response, g, render_template, jsonify, request
 from flask_cors import CORS
+import click
 import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
 import pandas as pd
-from io import StringIO
-from math import radians, cos, sin, sqrt, atan2
+import numpy as np
+import io
+from math import radians, cos, sin, sqrt, atan2, pi, isfinite
 import threading
+from concurrent.futures import Future, ThreadPoolExecutor, ProcessPoolExecutor, as_completed, wait, FIRST_COMPLETED, TimeoutError as FuturesTimeoutError
+from concurrent.futures.process import BrokenProcessPool
+import multiprocessing
+import json
+import re
+from collections import OrderedDict
+from contextlib import closing, contextmanager
+import contextvars
+import bisect
+import os
+import hashlib
+import shutil
+import tarfile
+import zipfile
+import time
+import zlib
+import weakref
+
+try:
+    import pyarrow as pa
+except ImportError:
+    pa = None
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+def available_cpus():
+    # sched_getaffinity honours cpusets such as docker-compose's, but only
+    # exists on Linux.
+    if hasattr(os, "sched_getaffinity"):
+        return len(os.sched_getaffinity(0))
+    return os.cpu_count() or 1
 
 GHCN_BASE_URL = "https://www.ncei.noaa.gov/pub/data/ghcn/daily/"
+CACHE_DIR = os.environ.get("GHCN_CACHE_DIR", os.path.join(os.path.dirname(os.path.abspath(__file__)), "cache"))
+CATALOG_MAX_AGE_SECONDS = int(os.environ.get("GHCN_CATALOG_MAX_AGE", 24 * 3600))
+CATALOG_REFRESH_SECONDS = int(os.environ.get("GHCN_CATALOG_REFRESH", 3600))
+WEATHER_CACHE_BYTES = int(os.environ.get("GHCN_WEATHER_CACHE_BYTES", 256 * 1024 * 1024))
+WEATHER_MAX_AGE_SECONDS = int(os.environ.get("GHCN_WEATHER_MAX_AGE", 6 * 3600))
+RESPONSE_CACHE_BYTES = int(os.environ.get("GHCN_RESPONSE_CACHE_BYTES", 32 * 1024 * 1024))
+RESPONSE_CACHE_TTL_SECONDS = float(os.environ.get("GHCN_RESPONSE_CACHE_TTL", 600))
+RESPONSE_MAX_AGE_SECONDS = int(os.environ.get("GHCN_RESPONSE_MAX_AGE", 300))
+COORDINATE_PRECISION = int(os.environ.get("GHCN_COORDINATE_PRECISION", 3))
+REQUEST_PROFILING = os.environ.get("GHCN_REQUEST_PROFILING", "1") != "0"
+METRIC_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+MIRROR_DIR = os.environ.get("GHCN_MIRROR_DIR", os.path.join(CACHE_DIR, "mirror"))
+UPSTREAM_CONCURRENCY = int(os.environ.get("GHCN_UPSTREAM_CONCURRENCY", 32))
+UPSTREAM_TIMEOUT_SECONDS = float(os.environ.get("GHCN_UPSTREAM_TIMEOUT", 60))
+HTTP_POOL_SIZE = int(os.environ.get("GHCN_HTTP_POOL_SIZE", UPSTREAM_CONCURRENCY))
+HTTP_CONNECT_TIMEOUT = float(os.environ.get("GHCN_HTTP_CONNECT_TIMEOUT", 5))
+HTTP_READ_TIMEOUT = float(os.environ.get("GHCN_HTTP_READ_TIMEOUT", 30))
+HTTP_RETRIES = int(os.environ.get("GHCN_HTTP_RETRIES", 3))
+HTTP_BACKOFF_SECONDS = float(os.environ.get("GHCN_HTTP_BACKOFF", 0.5))
+EARTH_RADIUS_KM = 6371.0
+STATION_GRID_CELL_KM = 50.0
+MAX_GRID_COLUMNS = 4096
+TEMPERATURE_ELEMENTS = ['TMIN', 'TMAX']
+DLY_RECORD_LENGTH = 269
+CLIMATOLOGY_DTYPE = np.dtype([("element", np.int8), ("year", np.int16), ("month", np.int8), ("sum", np.int64), ("count", np.int32)])
+DLY_DAY_OFFSETS = 21 + 8 * np.arange(31)
+GHCN_CSV_COLUMNS = ["ID", "DATE", "ELEMENT", "VALUE", "M-FLAG", "Q-FLAG", "S-FLAG", "OBS-TIME"]
+CSV_CHUNK_ROWS = 250000
+MONTH_SEASON = np.array([0, 0, 0, 1, 1, 1, 2, 2, 2, 3, 3, 3, 0])
+NORTHERN_SEASONS = ["Winter", "Spring", "Summer", "Autumn"]
+SOUTHERN_SEASONS = ["Summer", "Autumn", "Winter", "Spring"]
+MAX_COVERAGE_STATIONS = 1000
+MAX_SUMMARY_STATIONS = 20
+AGGREGATE_PROCESSES = int(os.environ.get("GHCN_AGGREGATE_PROCESSES", available_cpus()))
+CSV_READ_BUFFER_BYTES = 1024 * 1024
+RESPONSE_CHUNK_ROWS = 50000
+HTTP_CHUNK_BYTES = 256 * 1024
+WEATHER_SYNC_TAIL_BYTES = 1024
+FIXED_WIDTH_BLOCK_LINES = 16384
+STATION_RECORD_LENGTH = 71
+INVENTORY_RECORD_LENGTH = 45
 
 app = Flask(__name__, static_folder="static", template_folder="templates")
 CORS(app)
 
 cached_stations = None
 cached_inventory = None
+catalog_footprint = {}
+station_index = None
+# Guards swapping station_index/cached_inventory/cached_stations as one unit;
+# retired_stations weakly tracks the stations frame the last swap replaced.
+catalog_lock = threading.Lock()
+retired_stations = None
+# Bumped with every catalog swap; cached /get_stations bodies are keyed on it.
+catalog_generation = 0
 preloading_complete = False
+# Set before the preload thread starts; while it runs, requests serve whatever
+# stage has finished instead of waiting for the whole catalog.
+preload_running = False
+PRELOAD_STAGES = ("stations", "inventory", "catalog")
+preload_stages = {name: {"state": "pending", "seconds": None, "rows": None} for name in PRELOAD_STAGES}
+
+class Metrics:
+    # Process-local counters and fixed-bucket histograms, rendered in the
+    # Prometheus text format. Each gunicorn worker keeps and serves its own.
+    def __init__(self, buckets):
+        self.buckets = buckets
+        self.lock = threading.Lock()
+        self.counters = {}
+        self.histograms = {}
+
+    def inc(self, name, amount=1, **labels):
+        key = (name, tuple(sorted(labels.items())))
+        with self.lock:
+            self.counters[key] = self.counters.get(key, 0) + amount
+
+    def observe(self, name, value, **labels):
+        key = (name, tuple(sorted(labels.items())))
+        position = bisect.bisect_left(self.buckets, value)
+        with self.lock:
+            state = self.histograms.get(key)
+            if state is None:
+                state = self.histograms[key] = {"buckets": [0] * (len(self.buckets) + 1), "sum": 0.0, "count": 0}
+            state["buckets"][position] += 1
+            state["sum"] += value
+            state["count"] += 1
+
+    def render(self, gauges=None):
+        def label_text(labels):
+            return "{" + ",".join(f'{key}="{value}"' for key, value in labels) + "}" if labels else ""
+
+        with self.lock:
+            counters = sorted(self.counters.items())
+            histograms = sorted((key, dict(state, buckets=list(state["buckets"]))) for key, state in self.histograms.items())
+        lines = []
+        typed = set()
+        for (name, labels), value in counters:
+            if name not in typed:
+                typed.add(name)
+                lines.append(f"# TYPE {name} counter")
+            lines.append(f"{name}{label_text(labels)} {value}")
+        for (name, labels), state in histograms:
+            if name not in typed:
+                typed.add(name)
+                lines.append(f"# TYPE {name} histogram")
+            cumulative = np.cumsum(state["buckets"])
+            for bound, count in zip([*self.buckets, "+Inf"], cumulative):
+                lines.append(f"{name}_bucket{label_text(labels + (('le', bound),))} {count}")
+            lines.append(f"{name}_sum{label_text(labels)} {state['sum']}")
+            lines.append(f"{name}_count{label_text(labels)} {state['count']}")
+        for name, value in (gauges or {}).items():
+            lines.append(f"# TYPE {name} gauge")
+            lines.append(f"{name} {value}")
+        return "\n".join(lines) + "\n"
+
+metrics = Metrics(METRIC_BUCKETS)
+# Stages timed while a profiled request runs; copied into the upstream threads
+# that do its downloads, so their stages land in the same list.
+request_profile = contextvars.ContextVar("request_profile", default=None)
+
+def record_stage(stage, seconds, source):
+    metrics.observe("ghcn_stage_seconds", seconds, stage=stage, source=source)
+    profile = request_profile.get()
+    if profile is not None:
+        profile.append((stage, seconds))
+
+@contextmanager
+def timed_stage(stage, source):
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        record_stage(stage, time.perf_counter() - start, source)
+
+def count_cache(cache, result):
+    metrics.inc("ghcn_cache_requests_total", cache=cache, result=result)
+
+def submit_upstream(fn, *args, **kwargs):
+    return upstream_executor.submit(contextvars.copy_context().run, fn, *args, **kwargs)
+
+@app.before_request
+def start_request_timing():
+    g.request_started = time.perf_counter()
+    profiling = REQUEST_PROFILING and request.headers.get("X-Profile") == "1"
+    request_profile.set([] if profiling else None)
+
+@app.after_request
+def finish_request_timing(response):
+    started = getattr(g, "request_started", None)
+    if started is None:
+        return response
+    elapsed = time.perf_counter() - started
+    metrics.observe("ghcn_request_seconds", elapsed, endpoint=request.endpoint or "unknown")
+    profile = request_profile.get()
+    if profile is not None:
+        # A streamed body is serialized after this point; its time only shows
+        # up in /metrics.
+        stages = {}
+        for stage, seconds in profile:
+            stages[stage] = stages.get(stage, 0.0) + seconds
+        timings = [f"{stage};dur={seconds * 1000:.2f}" for stage, seconds in stages.items()]
+        response.headers["Server-Timing"] = ", ".join(timings + [f"total;dur={elapsed * 1000:.2f}"])
+    return response
+
+@app.route('/metrics')
+def metrics_endpoint():
+    gauges = {
+        "ghcn_weather_cache_bytes": weather_cache.size,
+        "ghcn_response_cache_bytes": stations_response_cache.size,
+        "ghcn_catalog_stations": len(cached_stations) if cached_stations is not None else 0,
+    }
+    return Response(metrics.render(gauges), mimetype="text/plain; version=0.0.4")
 
 @app.route('/preload_status')
 def preload_status():
-    if preloading_complete:
-        return jsonify({"status": "done"})
-    return jsonify({"status": "loading"})
+    status = "done" if preloading_complete else "loading"
+    return jsonify({"status": status, "stages": preload_stages, "catalog_bytes": catalog_footprint})
 
 @app.route('/')
 def index():
-    stations = load_stations()
+    stations = cached_stations if preload_running else load_stations()
     station_count = len(stations) if stations is not None else 0
     return render_template("index.html", station_count=station_count)
 
@@ -37,52 +239,590 @@ def haversine(lat1, lon1, lat2, lon2):
     c = 2 * atan2(sqrt(a), sqrt(1 - a))
     return R * c
 
+def to_unit_vectors(latitudes, longitudes):
+    lat = np.radians(np.asarray(latitudes, dtype=np.float64))
+    lon = np.radians(np.asarray(longitudes, dtype=np.float64))
+    cos_lat = np.cos(lat)
+    return np.column_stack((cos_lat * np.cos(lon), cos_lat * np.sin(lon), np.sin(lat)))
+
+def chord_length(distance_km):
+    return 2 * sin(min(distance_km / EARTH_RADIUS_KM, pi) / 2)
+
+def build_temperature_coverage(inventory_df):
+    # One row per station that has every temperature element: the joint
+    # FIRSTYEAR/LASTYEAR plus <ELEMENT>_FIRSTYEAR/<ELEMENT>_LASTYEAR columns.
+    temperatures = inventory_df[inventory_df['ELEMENT'].isin(TEMPERATURE_ELEMENTS)]
+    per_element = temperatures.groupby(['ID', 'ELEMENT']).agg(FIRSTYEAR=('FIRSTYEAR', 'min'), LASTYEAR=('LASTYEAR', 'max'))
+    wide = per_element.unstack('ELEMENT').dropna()
+    coverage = pd.DataFrame({
+        'FIRSTYEAR': wide['FIRSTYEAR'].max(axis=1),
+        'LASTYEAR': wide['LASTYEAR'].min(axis=1),
+    })
+    for element in TEMPERATURE_ELEMENTS:
+        coverage[f'{element}_FIRSTYEAR'] = wide[('FIRSTYEAR', element)]
+        coverage[f'{element}_LASTYEAR'] = wide[('LASTYEAR', element)]
+    return coverage
+
+class StationIndex:
+    # Read-only spatial index over a stations frame. Stations are bucketed into a
+    # cubic grid over their unit vectors, which has no seams at the poles or the
+    # antimeridian; a query only visits the grid columns its ball overlaps.
+    ARRAYS = ("xyz", "order", "sorted_keys", "first_year", "last_year", "element_years")
+
+    def __init__(self, stations, inventory=None, coverage=None, cell_km=STATION_GRID_CELL_KM):
+        self.stations = stations
+        self.inventory = inventory
+        if coverage is None and inventory is not None:
+            coverage = build_temperature_coverage(inventory)
+        # Joint TMIN/TMAX first and last year per station row; stations without
+        # both elements get an empty range that no year filter can match.
+        self.first_year = None
+        self.last_year = None
+        self.element_years = None
+        if coverage is not None:
+            aligned = coverage.reindex(stations['ID'].to_numpy())
+            no_first, no_last = np.iinfo(np.int16).max, np.iinfo(np.int16).min
+            self.first_year = aligned['FIRSTYEAR'].fillna(no_first).to_numpy().astype(np.int16)
+            self.last_year = aligned['LASTYEAR'].fillna(no_last).to_numpy().astype(np.int16)
+            # Per-element (first, last) years, shape (stations, elements, 2).
+            self.element_years = np.stack([
+                np.column_stack((
+                    aligned[f'{element}_FIRSTYEAR'].fillna(no_first).to_numpy(),
+                    aligned[f'{element}_LASTYEAR'].fillna(no_last).to_numpy(),
+                ))
+                for element in TEMPERATURE_ELEMENTS
+            ], axis=1).astype(np.int16)
+        self.id_index = None
+        self.versions = None
+        # Set when the index is installed; keys the /get_stations response cache.
+        self.generation = None
+        # Whether the index's arrays are on disk as the catalog snapshot.
+        self.published = False
+        self.xyz = to_unit_vectors(stations['LATITUDE'].to_numpy(), stations['LONGITUDE'].to_numpy())
+        self._set_cell_size(cell_km)
+        keys = self._cell_keys(self._cell_coords(self.xyz))
+        self.order = np.argsort(keys, kind="stable")
+        self.sorted_keys = keys[self.order]
+
+    @classmethod
+    def attach(cls, stations, cell_km, arrays):
+        index = cls.__new__(cls)
+        index.stations = stations
+        index.inventory = None
+        index.id_index = None
+        index.versions = None
+        index.generation = None
+        index.published = True
+        index._set_cell_size(cell_km)
+        for name in cls.ARRAYS:
+            setattr(index, name, arrays.get(name))
+        return index
+
+    def arrays(self):
+        return {name: getattr(self, name) for name in self.ARRAYS if getattr(self, name) is not None}
+
+    def _set_cell_size(self, cell_km):
+        self.cell_km = cell_km
+        self.cell_size = chord_length(cell_km)
+        self.cells_per_axis = int(np.ceil(2.0 / self.cell_size)) + 1
+
+    def _cell_coords(self, xyz):
+        cells = np.floor((np.asarray(xyz) + 1.0) / self.cell_size).astype(np.int64)
+        return np.clip(cells, 0, self.cells_per_axis - 1)
+
+    def _cell_keys(self, cells):
+        n = self.cells_per_axis
+        return (cells[..., 0] * n + cells[..., 1]) * n + cells[..., 2]
+
+    def candidates(self, lat, lon, radius_km):
+        if radius_km >= pi * EARTH_RADIUS_KM:
+            return None
+        query = to_unit_vectors([lat], [lon])[0]
+        reach = chord_length(radius_km)
+        low = self._cell_coords(query - reach)
+        high = self._cell_coords(query + reach)
+        if (high[0] - low[0] + 1) * (high[1] - low[1] + 1) > MAX_GRID_COLUMNS:
+            return None
+        ix, iy = np.meshgrid(np.arange(low[0], high[0] + 1), np.arange(low[1], high[1] + 1), indexing="ij")
+        n = self.cells_per_axis
+        column_keys = (ix.ravel() * n + iy.ravel()) * n
+        starts = np.searchsorted(self.sorted_keys, column_keys + low[2], side="left")
+        ends = np.searchsorted(self.sorted_keys, column_keys + high[2], side="right")
+        hits = ends > starts
+        if not hits.any():
+            return np.empty(0, dtype=np.int64)
+        return np.concatenate([self.order[start:end] for start, end in zip(starts[hits], ends[hits])])
+
+    def distances(self, lat, lon, positions=None):
+        query = to_unit_vectors([lat], [lon])[0]
+        xyz = self.xyz if positions is None else self.xyz[positions]
+        # The chord between two unit vectors is 2 * sin(c / 2), which makes this
+        # the same great-circle distance the scalar haversine() returns.
+        chord_sq = np.clip(2.0 - 2.0 * (xyz @ query), 0.0, 4.0)
+        return 2 * EARTH_RADIUS_KM * np.arcsin(np.sqrt(chord_sq) / 2)
+
+    def query_radius(self, lat, lon, radius_km, predicate=None):
+        positions = self.candidates(lat, lon, radius_km)
+        if positions is None:
+            positions = np.arange(len(self.xyz))
+        if predicate is not None and len(positions):
+            positions = positions[predicate(positions)]
+        distances = self.distances(lat, lon, positions)
+        within = distances <= radius_km
+        positions, distances = positions[within], distances[within]
+        order = np.lexsort((positions, distances))
+        return positions[order], distances[order]
+
+    def query_nearest(self, lat, lon, count, radius_km=None, predicate=None):
+        # No two points are further apart than half the circumference.
+        max_radius = pi * EARTH_RADIUS_KM if radius_km is None else min(radius_km, pi * EARTH_RADIUS_KM)
+        if count <= 0:
+            return np.empty(0, dtype=np.int64), np.empty(0)
+        search_radius = min(self.cell_km, max_radius)
+        while True:
+            positions, distances = self.query_radius(lat, lon, search_radius, predicate)
+            # Written so that a NaN radius also ends the search.
+            if len(positions) >= count or not search_radius < max_radius:
+                return positions[:count], distances[:count]
+            search_radius = min(search_radius * 4, max_radius)
+
+    def locate(self, station_ids):
+        ids = self.stations['ID']
+        if isinstance(ids.dtype, pd.CategoricalDtype):
+            # Look IDs up in the catalog-wide categories shared with the
+            # inventory, then map category codes to this frame's rows.
+            if self.id_index is None:
+                self.id_index = np.full(len(ids.cat.categories) + 1, -1, dtype=np.int64)
+                self.id_index[ids.cat.codes.to_numpy()] = np.arange(len(ids))
+            return self.id_index[ids.cat.categories.get_indexer(station_ids)]
+        if self.id_index is None:
+            self.id_index = pd.Index(ids.to_numpy())
+        return self.id_index.get_indexer(station_ids)
+
+    def covers(self, positions, start_year, end_year):
+        return (self.first_year[positions] <= start_year) & (self.last_year[positions] >= end_year)
+
+def get_station_index(stations_df, inventory_df=None):
+    # A caller still holding a stations frame the refresher has since replaced
+    # gets the current index instead of a rebuild of the old catalog, so rows
+    # must always be taken from index.stations.
+    global station_index, catalog_generation
+    with catalog_lock:
+        index = station_index
+        missing_coverage = inventory_df is not None and index is not None and index.first_year is None
+        replaced = (
+            index is not None and retired_stations is not None
+            and retired_stations() is stations_df and index.stations is cached_stations
+        )
+        if index is None or (index.stations is not stations_df and not replaced) or missing_coverage:
+            index = StationIndex(stations_df, inventory_df)
+            station_index = index
+            catalog_generation += 1
+            index.generation = catalog_generation
+        return index
+
+def create_http_session():
+    # One pooled session for every NOAA request: kept-alive TLS connections,
+    # bounded retries with backoff for transient failures, compressed bodies.
+    retry = Retry(
+        total=HTTP_RETRIES,
+        backoff_factor=HTTP_BACKOFF_SECONDS,
+        status_forcelist=(429, 500, 502, 503, 504),
+        allowed_methods=frozenset(["GET", "HEAD"]),
+        raise_on_status=False,
+    )
+    adapter = HTTPAdapter(pool_connections=4, pool_maxsize=HTTP_POOL_SIZE, max_retries=retry)
+    session = requests.Session()
+    session.mount("https://", adapter)
+    session.mount("http://", adapter)
+    session.headers["Accept-Encoding"] = "gzip, deflate"
+    return session
+
+http_session = create_http_session()
+
+def http_get(url, headers=None, stream=False):
+    return http_session.get(url, headers=headers, stream=stream, timeout=(HTTP_CONNECT_TIMEOUT, HTTP_READ_TIMEOUT))
+
+def write_json_atomic(path, data):
+    tmp_path = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+    with open(tmp_path, "w") as f:
+        json.dump(data, f)
+    os.replace(tmp_path, path)
+
+def catalog_cache_path(name):
+    return os.path.join(CACHE_DIR, "catalog", name)
+
+def read_cached_table(name):
+    path = catalog_cache_path(name)
+    try:
+        with open(os.path.join(path, "meta.json")) as f:
+            meta = json.load(f)
+        columns = {}
+        for column, kind in meta["columns"].items():
+            values = np.load(os.path.join(path, f"{column}.npy"), mmap_mode="r")
+            if kind == "category":
+                categories = np.load(os.path.join(path, f"{column}.values.npy"))
+                categories = pd.Index([value.decode("utf-8") for value in categories])
+                values = pd.Categorical.from_codes(values, categories)
+            elif kind == "str":
+                # String columns are stored dictionary-encoded, so only the
+                # distinct values need decoding on a warm start.
+                uniques = np.load(os.path.join(path, f"{column}.values.npy"))
+                values = np.array([value.decode("utf-8") for value in uniques], dtype=object)[values]
+            columns[column] = values
+        return pd.DataFrame(columns), meta
+    except (OSError, ValueError, KeyError) as e:
+        if not isinstance(e, FileNotFoundError):
+            print(f"Ignoring unreadable catalog cache {name}:", e)
+        return None, None
+
+def read_cached_arrays(name, names):
+    path = catalog_cache_path(name)
+    return {
+        array: np.load(os.path.join(path, f"{array}.array.npy"), mmap_mode="r")
+        for array in names
+    }
+
+def write_cached_table(name, df, meta, arrays=None):
+    path = catalog_cache_path(name)
+    tmp_path = f"{path}.{os.getpid()}.tmp"
+    shutil.rmtree(tmp_path, ignore_errors=True)
+    os.makedirs(tmp_path)
+    kinds = {}
+    for column in df.columns:
+        if isinstance(df[column].dtype, pd.CategoricalDtype):
+            kinds[column] = "category"
+            values = df[column].cat.codes.to_numpy()
+            categories = df[column].cat.categories
+            encoded = np.array([value.encode("utf-8") for value in categories], dtype="S")
+            np.save(os.path.join(tmp_path, f"{column}.values.npy"), encoded)
+        elif pd.api.types.is_numeric_dtype(df[column]):
+            kinds[column] = "num"
+            values = df[column].to_numpy()
+        else:
+            kinds[column] = "str"
+            values, uniques = pd.factorize(df[column].fillna(""))
+            encoded = np.array([value.encode("utf-8") for value in uniques], dtype="S")
+            np.save(os.path.join(tmp_path, f"{column}.values.npy"), encoded)
+        np.save(os.path.join(tmp_path, f"{column}.npy"), values)
+    for array, values in (arrays or {}).items():
+        np.save(os.path.join(tmp_path, f"{array}.array.npy"), values)
+    meta = dict(meta, columns=kinds, arrays=sorted(arrays or {}))
+    write_json_atomic(os.path.join(tmp_path, "meta.json"), meta)
+    old_path = f"{path}.{os.getpid()}.old"
+    if os.path.exists(path):
+        os.replace(path, old_path)
+    os.replace(tmp_path, path)
+    shutil.rmtree(old_path, ignore_errors=True)
+
+def load_catalog_table(name, filename, parse, max_age=None):
+    # The returned frame carries the fetched_at of the upstream body it came
+    # from in attrs, which is how a built catalog knows its table versions.
+    cached, meta = read_cached_table(name)
+    if cached is not None:
+        cached.attrs["fetched_at"] = meta.get("fetched_at")
+    if cached is not None and time.time() - meta["checked_at"] < (CATALOG_MAX_AGE_SECONDS if max_age is None else max_age):
+        print(f"Loaded {filename} from local cache.")
+        count_cache("catalog", "hit")
+        return cached
+    count_cache("catalog", "miss")
+
+    headers = {}
+    if cached is not None:
+        if meta.get("etag"):
+            headers["If-None-Match"] = meta["etag"]
+        if meta.get("last_modified"):
+            headers["If-Modified-Since"] = meta["last_modified"]
+    print(f"Loading {filename} from NOAA...")
+    start = time.perf_counter()
+    try:
+        response = http_get(f"{GHCN_BASE_URL}{filename}", headers=headers)
+    except requests.RequestException as e:
+        print(f"Failed to load {filename}:", e)
+        return cached
+    if response.status_code == 304 and cached is not None:
+        print(f"{filename} not modified upstream, using local cache.")
+        meta["checked_at"] = time.time()
+        write_json_atomic(os.path.join(catalog_cache_path(name), "meta.json"), meta)
+        return cached
+    if response.status_code != 200:
+        print(f"Failed to load {filename}. HTTP status code:", response.status_code)
+        if cached is not None:
+            print(f"Falling back to stale local cache for {filename}.")
+        return cached
+
+    text = response.text
+    record_stage("download", time.perf_counter() - start, name)
+    metrics.inc("ghcn_download_bytes_total", len(response.content), source=name)
+    with timed_stage("parse", name):
+        df = parse(text)
+    metrics.inc("ghcn_parsed_rows_total", len(df), source=name)
+    df.attrs["fetched_at"] = time.time()
+    try:
+        os.makedirs(os.path.dirname(catalog_cache_path(name)), exist_ok=True)
+        write_cached_table(name, df, {
+            "etag": response.headers.get("ETag"),
+            "last_modified": response.headers.get("Last-Modified"),
+            "checked_at": df.attrs["fetched_at"],
+            "fetched_at": df.attrs["fetched_at"],
+        })
+    except OSError as e:
+        print(f"Could not write catalog cache {name}:", e)
+    return df
+
+def frame_bytes(df):
+    return int(df.memory_usage(index=True, deep=True).sum())
+
+def report_footprint(name, text_bytes, compact):
+    after = frame_bytes(compact)
+    catalog_footprint[name] = {"text": text_bytes, "compact": after}
+    print(f"Parsed {name} table: {text_bytes / 1e6:.1f} MB of text -> {after / 1e6:.1f} MB ({len(compact)} rows).")
+
+def fixed_width_text(records, start, end):
+    fields = np.ascontiguousarray(records[:, start:end]).view(f"S{end - start}").ravel()
+    return np.char.strip(fields).astype(str)
+
+def parse_ascii_floats(chars):
+    fields = np.ascontiguousarray(chars).view(f"S{chars.shape[-1]}").ravel()
+    try:
+        return fields.astype(np.float64)
+    except ValueError:
+        # Blank or malformed fields become NaN, like pd.to_numeric(errors='coerce').
+        text = pd.Series(np.char.strip(fields).astype(str))
+        return pd.to_numeric(text, errors='coerce').to_numpy(dtype=np.float64)
+
+def parse_stations_from_string(data):
+    # Fixed columns of ghcnd-stations.txt, sliced straight out of the bytes.
+    records = fixed_width_records(data, STATION_RECORD_LENGTH, pad=True)
+    ids = fixed_width_text(records, 0, 11)
+    latitudes = parse_ascii_floats(records[:, 12:20])
+    longitudes = parse_ascii_floats(records[:, 21:30])
+    keep = (ids != "") & ~np.isnan(latitudes) & ~np.isnan(longitudes)
+    keep[keep] = ~pd.Index(ids[keep]).duplicated()
+    records, ids = records[keep], ids[keep]
+    states = fixed_width_text(records, 38, 40)
+    # Categories keep the catalog's own order, so a stations frame starts out
+    # with codes equal to its row numbers.
+    compact = pd.DataFrame({
+        'ID': pd.Categorical.from_codes(np.arange(len(ids)), categories=pd.Index(ids)),
+        'LATITUDE': latitudes[keep].astype(np.float32),
+        'LONGITUDE': longitudes[keep].astype(np.float32),
+        'ELEVATION': parse_ascii_floats(records[:, 31:37]).astype(np.float32),
+        'STATE': pd.Categorical(np.where(states == "", "unknown", states)),
+        'NAME': fixed_width_text(records, 41, 71),
+    })
+    report_footprint("stations", len(data), compact)
+    return compact
+
+def parse_inventory_from_string(data):
+    # Only the temperature elements are ever queried, so every other element
+    # (the large majority of the ~750k inventory rows) is dropped before any
+    # other column is parsed.
+    records = fixed_width_records(data, INVENTORY_RECORD_LENGTH, pad=True)
+    element_fields = np.ascontiguousarray(records[:, 31:35]).view("S4").ravel()
+    element_codes = np.full(len(records), -1, dtype=np.int8)
+    for code, element in enumerate(TEMPERATURE_ELEMENTS):
+        element_codes[element_fields == element.encode("ascii")] = code
+    records, element_codes = records[element_codes >= 0], element_codes[element_codes >= 0]
+    first_years, valid_first = parse_ascii_ints(records[:, 36:40])
+    last_years, valid_last = parse_ascii_ints(records[:, 41:45])
+    ids = np.ascontiguousarray(records[:, 0:11]).view("S11").ravel()
+    keep = valid_first & valid_last & (np.char.strip(ids) != b"")
+    id_values, id_codes = np.unique(np.char.strip(ids[keep]), return_inverse=True)
+    compact = pd.DataFrame({
+        'ID': pd.Categorical.from_codes(id_codes, categories=pd.Index(id_values.astype(str))),
+        'ELEMENT': pd.Categorical.from_codes(element_codes[keep], categories=TEMPERATURE_ELEMENTS),
+        'FIRSTYEAR': first_years[keep].astype(np.int16),
+        'LASTYEAR': last_years[keep].astype(np.int16),
+    })
+    report_footprint("inventory", len(data), compact)
+    return compact
+
+def share_station_ids(stations_df, inventory_df):
+    # Recode the inventory's IDs against the stations' categories: both tables
+    # then hold small integer codes into one shared ID index, and rows for
+    # stations missing from the catalog are dropped.
+    if not isinstance(stations_df['ID'].dtype, pd.CategoricalDtype):
+        return inventory_df
+    categories = stations_df['ID'].cat.categories
+    ids = inventory_df['ID']
+    if isinstance(ids.dtype, pd.CategoricalDtype) and ids.cat.categories is categories:
+        return inventory_df
+    if isinstance(ids.dtype, pd.CategoricalDtype):
+        codes = categories.get_indexer(ids.cat.categories)[ids.cat.codes.to_numpy()]
+    else:
+        codes = categories.get_indexer(ids.astype(str))
+    known = codes >= 0
+    shared = pd.Categorical.from_codes(codes[known], dtype=stations_df['ID'].dtype)
+    return inventory_df[known].assign(ID=shared).reset_index(drop=True)
+
+def attach_catalog_snapshot(versions=None):
+    # With versions, only a snapshot built from exactly those table versions
+    # is accepted, whatever its age.
+    stations, meta = read_cached_table("snapshot")
+    if stations is None:
+        return None
+    if versions is None and time.time() - meta["built_at"] >= CATALOG_MAX_AGE_SECONDS:
+        return None
+    if versions is not None and meta.get("versions") != versions:
+        return None
+    try:
+        arrays = read_cached_arrays("snapshot", meta["arrays"])
+    except (OSError, ValueError) as e:
+        print("Ignoring unreadable catalog snapshot:", e)
+        return None
+    index = StationIndex.attach(stations, meta["cell_km"], arrays)
+    index.versions = meta.get("versions")
+    return index
+
+def publish_catalog_snapshot(index):
+    # Workers map these files read-only, so every process shares one copy of
+    # the index arrays through the page cache instead of building its own.
+    try:
+        os.makedirs(os.path.dirname(catalog_cache_path("snapshot")), exist_ok=True)
+        meta = {"built_at": time.time(), "cell_km": index.cell_km, "versions": index.versions}
+        write_cached_table("snapshot", index.stations, meta, index.arrays())
+    except OSError as e:
+        print("Could not publish catalog snapshot:", e)
+        return False
+    return True
+
+def build_catalog_snapshot():
+    global cached_stations, cached_inventory, station_index, retired_stations
+    load_stations()
+    # A stations-only index (inventory unavailable) is never published.
+    published = station_index is not None and station_index.published
+    # Run by the gunicorn master before forking: workers attach to the published
+    # snapshot, so the master drops its own copy instead of handing it down.
+    with catalog_lock:
+        cached_stations = cached_inventory = station_index = retired_stations = None
+    return published
+
 def load_stations():
-    global cached_stations
     if cached_stations is None:
-        print("Loading station data from NOAA...")
-        stations_url = f"{GHCN_BASE_URL}ghcnd-stations.txt"
-        response = requests.get(stations_url)
-        if response.status_code != 200:
-            print("Failed to load station data. HTTP status code:", response.status_code)
-            return None
-        stations_data = response.text
-        colspecs = [(0, 11), (12, 20), (21, 30), (31, 37), (38, 40), (41, 71)]
-        columns = ['ID', 'LATITUDE', 'LONGITUDE', 'ELEVATION', 'STATE', 'NAME']
-        df_stations = pd.read_fwf(StringIO(stations_data), colspecs=colspecs, names=columns)
-        df_stations.dropna(subset=['LATITUDE', 'LONGITUDE'], inplace=True)
-        df_stations["STATE"] = df_stations["STATE"].fillna("unknown")
-        print("Station data loaded successfully.")
-        
-        inventory_df = load_inventory()
+        return single_flight.do("catalog", load_stations_uncoalesced)
+    return cached_stations
+
+def run_stage(name, fn, *args):
+    stage = preload_stages[name]
+    stage.update(state="running", seconds=None, rows=None)
+    start = time.perf_counter()
+    try:
+        result = fn(*args)
+    except Exception:
+        stage.update(state="failed", seconds=round(time.perf_counter() - start, 3))
+        raise
+    stage.update(
+        state="done" if result is not None else "failed",
+        seconds=round(time.perf_counter() - start, 3),
+        rows=len(result) if result is not None else None,
+    )
+    return result
+
+def load_stations_uncoalesced():
+    if cached_stations is None:
+        index = attach_catalog_snapshot()
+        if index is not None:
+            install_catalog(index)
+            for name in PRELOAD_STAGES:
+                preload_stages[name].update(state="done", seconds=0.0, rows=None)
+            preload_stages["catalog"]["rows"] = len(index.stations)
+            print(f"Attached catalog snapshot with {len(index.stations)} stations.")
+    if cached_stations is None:
+        # Both tables download and parse at the same time; the stations alone are
+        # installed as soon as they are ready so nearby searches can be answered
+        # while the inventory is still on its way. The inventory thread belongs
+        # to this call: the gunicorn master runs it before forking, and a
+        # module-level pool would leave forked workers with a dead thread.
+        with ThreadPoolExecutor(max_workers=1, thread_name_prefix="catalog") as executor:
+            inventory_future = executor.submit(run_stage, "inventory", load_inventory)
+            df_stations = run_stage("stations", load_catalog_table, "stations", "ghcnd-stations.txt", parse_stations_from_string)
+            if df_stations is None:
+                return None
+            print("Station data loaded successfully.")
+            if not inventory_future.done():
+                install_catalog(StationIndex(df_stations))
+            inventory_df = inventory_future.result()
         if inventory_df is None:
             print("Failed to load inventory data. Returning station data without filtering.")
-            cached_stations = df_stations
+            if cached_stations is None:
+                install_catalog(StationIndex(df_stations))
         else:
-            valid_inventory = inventory_df[inventory_df['ELEMENT'].isin(['TMIN', 'TMAX'])]
-            valid_station_ids = valid_inventory.groupby('ID')['ELEMENT'].nunique()
-            valid_station_ids = valid_station_ids[valid_station_ids == 2].index.tolist()
-            df_stations = df_stations[df_stations['ID'].isin(valid_station_ids)]
-            cached_stations = df_stations
-            print(f"Filtered stations: {len(cached_stations)} stations have both TMIN and TMAX data.")
+            run_stage("catalog", install_full_catalog, df_stations, inventory_df)
     return cached_stations
 
+def install_full_catalog(df_stations, inventory_df):
+    index = build_catalog(df_stations, inventory_df)
+    install_catalog(index)
+    index.published = publish_catalog_snapshot(index)
+    return index.stations
+
+def build_catalog(df_stations, inventory_df):
+    versions = {"stations": df_stations.attrs.get("fetched_at"), "inventory": inventory_df.attrs.get("fetched_at")}
+    inventory_df = share_station_ids(df_stations, inventory_df)
+    coverage = build_temperature_coverage(inventory_df)
+    df_stations = df_stations[df_stations['ID'].isin(coverage.index)]
+    index = StationIndex(df_stations, inventory_df, coverage)
+    index.versions = versions
+    print(f"Filtered stations: {len(df_stations)} stations have both TMIN and TMAX data.")
+    return index
+
+def install_catalog(index):
+    # The index is the unit of consistency: it carries its stations and, when
+    # built here, its inventory. Readers that go through get_station_index and
+    # index.stations never see one catalog's rows with another's index.
+    global cached_stations, cached_inventory, station_index, retired_stations, catalog_generation
+    with catalog_lock:
+        retired_stations = weakref.ref(cached_stations) if cached_stations is not None else None
+        station_index = index
+        cached_inventory = index.inventory
+        cached_stations = index.stations
+        catalog_generation += 1
+        index.generation = catalog_generation
+    stations_response_cache.clear()
+
+def refresh_catalog():
+    # Revalidates both tables with conditional requests (a table another worker
+    # checked within CATALOG_REFRESH_SECONDS counts as fresh) and swaps in a new
+    # catalog only when an upstream body changed since the current one was built.
+    df_stations = load_catalog_table("stations", "ghcnd-stations.txt", parse_stations_from_string, CATALOG_REFRESH_SECONDS)
+    inventory_df = load_catalog_table("inventory", "ghcnd-inventory.txt", parse_inventory_from_string, CATALOG_REFRESH_SECONDS)
+    if df_stations is None or inventory_df is None:
+        return False
+    versions = {"stations": df_stations.attrs.get("fetched_at"), "inventory": inventory_df.attrs.get("fetched_at")}
+    current = station_index
+    if current is not None and current.versions == versions:
+        return False
+    index = attach_catalog_snapshot(versions)
+    if index is None:
+        index = build_catalog(df_stations, inventory_df)
+        index.published = publish_catalog_snapshot(index)
+    install_catalog(index)
+    print(f"Catalog refreshed: {len(index.stations)} stations.")
+    return True
+
+def refresh_catalog_periodically():
+    while True:
+        time.sleep(CATALOG_REFRESH_SECONDS)
+        try:
+            refresh_catalog()
+        except Exception as e:
+            print("Catalog refresh failed:", e)
+
 def load_inventory():
+    if cached_inventory is None:
+        return single_flight.do("inventory", load_inventory_uncoalesced)
+    return cached_inventory
+
+def load_inventory_uncoalesced():
     global cached_inventory
     if cached_inventory is not None:
         return cached_inventory
 
-    print("Loading inventory data from NOAA...")
-    inventory_url = f"{GHCN_BASE_URL}ghcnd-inventory.txt"
-    response = requests.get(inventory_url)
-    if response.status_code != 200:
-        print("Failed to load inventory data. HTTP status code:", response.status_code)
+    inventory_df = load_catalog_table("inventory", "ghcnd-inventory.txt", parse_inventory_from_string)
+    if inventory_df is None:
         return None
-    inventory_data = response.text
-    colspecs = [(0, 11), (12, 20), (21, 30), (31, 35), (36, 40), (41, 45)]
-    columns = ['ID', 'LATITUDE', 'LONGITUDE', 'ELEMENT', 'FIRSTYEAR', 'LASTYEAR']
-    cached_inventory = pd.read_fwf(StringIO(inventory_data), colspecs=colspecs, names=columns)
-    cached_inventory.dropna(subset=['ID'], inplace=True)
+    cached_inventory = inventory_df
     print("Inventory data loaded successfully.")
     return cached_inventory
 
@@ -90,78 +830,970 @@ def fetch_and_filter_stations(lat, lon, radius_km):
     stations_df = load_stations()
     if stations_df is None:
         return pd.DataFrame()
-    stations_df["DISTANCE"] = stations_df.apply(
-        lambda row: haversine(lat, lon, row['LATITUDE'], row['LONGITUDE']), axis=1
-    )
-    return stations_df[stations_df["DISTANCE"] <= radius_km].sort_values(by="DISTANCE")
+    index = get_station_index(stations_df)
+    positions, distances = index.query_radius(lat, lon, radius_km)
+    return index.stations.iloc[positions].assign(DISTANCE=distances)
+
+class ChunkReader(io.RawIOBase):
+    # Exposes an iterator of byte chunks (e.g. an HTTP body) as a readable file.
+    def __init__(self, chunks):
+        self.chunks = iter(chunks)
+        self.buffer = b""
+
+    def readable(self):
+        return True
 
-def parse_ghcnd_csv_from_string(data):
+    def peek_line(self):
+        while b"\n" not in self.buffer:
+            chunk = next(self.chunks, None)
+            if chunk is None:
+                break
+            self.buffer += chunk
+        return self.buffer.split(b"\n", 1)[0]
 
-    col_names = ["ID", "DATE", "ELEMENT", "VALUE", "M-FLAG", "Q-FLAG", "S-FLAG", "OBS-TIME"]
+    def readinto(self, target):
+        while not self.buffer:
+            chunk = next(self.chunks, None)
+            if chunk is None:
+                return 0
+            self.buffer = chunk
+        size = min(len(target), len(self.buffer))
+        target[:size] = self.buffer[:size]
+        self.buffer = self.buffer[size:]
+        return size
+
+def to_dates(years, months, days):
+    # Calendar dates for integer year/month/day arrays; invalid dates are NaT.
+    valid = (months >= 1) & (months <= 12) & (years >= 1) & (years <= 9999)
+    month_starts = np.where(valid, (years - 1970) * 12 + months - 1, 0).astype("datetime64[M]")
+    first_days = month_starts.astype("datetime64[D]")
+    days_in_month = ((month_starts + 1).astype("datetime64[D]") - first_days).astype(np.int64)
+    valid = valid & (days >= 1) & (days <= days_in_month)
+    dates = first_days + (days - 1)
+    dates[~valid] = np.datetime64("NaT")
+    return dates.astype("datetime64[us]"), valid
+
+def parse_ghcnd_csv_from_string(data, elements=None, start_year=None, end_year=None):
+    return parse_ghcnd_csv_stream([data.encode("utf-8")], elements, start_year, end_year)
+
+def parse_ghcnd_csv_stream(chunks, elements=None, start_year=None, end_year=None):
+    # Reads only DATE/ELEMENT/VALUE in bounded row chunks and drops unwanted
+    # rows per chunk, so memory follows the filtered result, not the file.
+    source = ChunkReader(chunks)
+    has_header = source.peek_line().lstrip().startswith(b"ID,")
+    frames = []
     try:
-        df = pd.read_csv(StringIO(data), names=col_names, dtype=str)
+        reader = pd.read_csv(
+            io.BufferedReader(source, CSV_READ_BUFFER_BYTES),
+            names=GHCN_CSV_COLUMNS,
+            usecols=["DATE", "ELEMENT", "VALUE"],
+            dtype={"ELEMENT": "category"},
+            skiprows=1 if has_header else 0,
+            chunksize=CSV_CHUNK_ROWS,
+        )
+        for chunk in reader:
+            # A malformed DATE or VALUE only drops its own row.
+            dates = pd.to_numeric(chunk["DATE"], errors="coerce")
+            values = pd.to_numeric(chunk["VALUE"], errors="coerce")
+            keep = dates.notna() & values.notna() & (values != -9999)
+            if elements is not None:
+                keep &= chunk["ELEMENT"].isin(elements)
+            if start_year is not None:
+                keep &= dates >= start_year * 10000
+            if end_year is not None:
+                keep &= dates < (end_year + 1) * 10000
+            frames.append(pd.DataFrame({"DATE": dates[keep], "ELEMENT": chunk["ELEMENT"][keep], "VALUE": values[keep]}))
     except Exception as e:
         print("Error parsing CSV data:", e)
-        return pd.DataFrame()
-    
-    df["DATE"] = pd.to_datetime(df["DATE"], format="%Y%m%d", errors="coerce")
-    df["VALUE"] = pd.to_numeric(df["VALUE"], errors="coerce")
-    df.loc[df["VALUE"] == -9999, "VALUE"] = None
-    df.dropna(subset=["VALUE"], inplace=True)
-    return df[["DATE", "ELEMENT", "VALUE"]]
-
-def parse_ghcnd_dly_from_string(data):
-
-    records = []
-    lines = data.splitlines()
-    for line in lines:
-        if len(line) < 269:
-            continue
-        station_id = line[0:11]
-        try:
-            year = int(line[11:15])
-            month = int(line[15:17])
-        except:
-            continue
-        element = line[17:21]
-        for day in range(1, 32):
-            start_index = 21 + (day - 1) * 8
-            end_index = start_index + 5
-            value_str = line[start_index:end_index]
-            try:
-                value = int(value_str)
-            except:
-                continue
-            if value == -9999:
-                continue
+        return pd.DataFrame(columns=["DATE", "ELEMENT", "VALUE"])
+
+    if not frames:
+        return pd.DataFrame(columns=["DATE", "ELEMENT", "VALUE"])
+    df = pd.concat(frames, ignore_index=True)
+    dates = df["DATE"].to_numpy(dtype=np.int64)
+    dates, valid = to_dates(dates // 10000, dates // 100 % 100, dates % 100)
+    df = pd.DataFrame({
+        "DATE": dates,
+        "ELEMENT": df["ELEMENT"].astype(str),
+        "VALUE": df["VALUE"].to_numpy(dtype=np.int64),
+    })
+    # Impossible calendar dates (e.g. Feb 30) are dropped, as in the .dly parser.
+    return df if valid.all() else df[valid].reset_index(drop=True)
+
+def parse_ascii_ints(chars):
+    # Vectorized int() over fixed-width ASCII fields (last axis): blanks around
+    # the number and one sign directly before the digits are accepted. Walks the
+    # few character positions once instead of materializing per-digit arrays.
+    shape = chars.shape[:-1]
+    values = np.zeros(shape, dtype=np.int64)
+    seen_digit = np.zeros(shape, dtype=bool)
+    seen_sign = np.zeros(shape, dtype=bool)
+    trailing = np.zeros(shape, dtype=bool)
+    invalid = np.zeros(shape, dtype=bool)
+    negative = np.zeros(shape, dtype=bool)
+    for position in range(chars.shape[-1]):
+        char = chars[..., position]
+        digit = char - np.uint8(ord("0"))
+        is_digit = digit < 10
+        is_space = char == ord(" ")
+        is_minus = char == ord("-")
+        is_sign = is_minus | (char == ord("+"))
+        invalid |= ~(is_digit | is_space | is_sign)
+        invalid |= is_digit & trailing
+        invalid |= is_sign & (seen_sign | seen_digit)
+        invalid |= is_space & seen_sign & ~seen_digit
+        trailing |= is_space & seen_digit
+        values = np.where(is_digit, values * 10 + digit, values)
+        seen_digit |= is_digit
+        seen_sign |= is_sign
+        negative |= is_minus
+    return np.where(negative, -values, values), seen_digit & ~invalid
+
+def fixed_width_records(data, record_length, pad=False):
+    # Returns one row of record_length bytes per line. Lines shorter than that
+    # are dropped, or with pad=True right-padded with blanks. A file whose lines
+    # all share one length is a plain reshape; anything else is gathered in
+    # blocks of lines so the index matrix never spans the whole file.
+    raw = data.encode("ascii", errors="replace") if isinstance(data, str) else bytes(data)
+    buffer = np.frombuffer(raw, dtype=np.uint8)
+    first_end = raw.find(b"\n")
+    content = first_end - (first_end > 0 and raw[first_end - 1] == ord("\r"))
+    if content >= record_length:
+        stride = first_end + 1
+        if len(buffer) % stride == 0 and (buffer[first_end::stride] == ord("\n")).all():
+            return buffer.reshape(-1, stride)[:, :record_length]
+    line_ends = np.flatnonzero(buffer == ord("\n"))
+    if len(buffer) and buffer[-1] != ord("\n"):
+        line_ends = np.append(line_ends, len(buffer))
+    line_starts = np.concatenate(([0], line_ends[:-1] + 1))
+    lengths = line_ends - line_starts
+    carriage_return = lengths > 0
+    carriage_return[carriage_return] = buffer[line_ends[carriage_return] - 1] == ord("\r")
+    lengths = lengths - carriage_return
+    if not pad:
+        keep = lengths >= record_length
+        line_starts, lengths = line_starts[keep], lengths[keep]
+    records = np.empty((len(line_starts), record_length), dtype=np.uint8)
+    columns = np.arange(record_length)
+    for start in range(0, len(line_starts), FIXED_WIDTH_BLOCK_LINES):
+        block = slice(start, start + FIXED_WIDTH_BLOCK_LINES)
+        positions = np.minimum(line_starts[block, None] + columns, len(buffer) - 1)
+        chunk = buffer[positions]
+        if pad:
+            chunk[columns >= lengths[block, None]] = ord(" ")
+        records[block] = chunk
+    return records
+
+def parse_ghcnd_dly_from_string(data, elements=None, start_year=None, end_year=None):
+
+    records = fixed_width_records(data, DLY_RECORD_LENGTH)
+    element_fields = records[:, 17:21].copy().view("S4").ravel()
+    years, valid_year = parse_ascii_ints(records[:, 11:15])
+    months, valid_month = parse_ascii_ints(records[:, 15:17])
+    lines = valid_year & valid_month
+    if elements is not None:
+        lines &= np.isin(element_fields, [element.encode("ascii") for element in elements])
+    # Lines outside the year range are dropped before their 31 day fields are parsed.
+    if start_year is not None:
+        lines &= years >= start_year
+    if end_year is not None:
+        lines &= years <= end_year
+    records, element_fields = records[lines], element_fields[lines]
+    years, months = years[lines], months[lines]
+
+    day_fields = records[:, DLY_DAY_OFFSETS[:, None] + np.arange(5)]
+    values, valid_value = parse_ascii_ints(day_fields)
+    dates, valid_date = to_dates(years[:, None], months[:, None], np.arange(1, 32))
+    keep = valid_value & (values != -9999) & valid_date
+
+    rows, day_index = np.nonzero(keep)
+    element_names, element_codes = np.unique(element_fields, return_inverse=True)
+    return pd.DataFrame({
+        "DATE": dates[rows, day_index],
+        "ELEMENT": np.array([element.decode("ascii") for element in element_names], dtype=object)[element_codes[rows]],
+        "VALUE": values[rows, day_index],
+    })
+
+class SingleFlight:
+    # Collapses concurrent calls with the same key into one execution; callers
+    # that arrive while it runs wait for it and share its result or exception.
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.calls = {}
+
+    def do(self, key, fn, *args, **kwargs):
+        with self.lock:
+            call = self.calls.get(key)
+            leader = call is None
+            if leader:
+                call = {"done": threading.Event(), "result": None, "error": None}
+                self.calls[key] = call
+        if not leader:
+            call["done"].wait()
+        else:
             try:
-                date = pd.Timestamp(year=year, month=month, day=day)
-            except Exception:
+                call["result"] = fn(*args, **kwargs)
+            except BaseException as e:
+                call["error"] = e
+            finally:
+                with self.lock:
+                    del self.calls[key]
+                call["done"].set()
+        if call["error"] is not None:
+            raise call["error"]
+        return call["result"]
+
+single_flight = SingleFlight()
+
+class WeatherCache:
+    # In-memory LRU of parsed per-station frames, bounded by their size in bytes.
+    def __init__(self, max_bytes):
+        self.max_bytes = max_bytes
+        self.entries = OrderedDict()
+        self.size = 0
+        self.lock = threading.Lock()
+
+    def get(self, station_id):
+        with self.lock:
+            entry = self.entries.get(station_id)
+            if entry is not None:
+                self.entries.move_to_end(station_id)
+            return entry
+
+    def put(self, station_id, data, meta):
+        data.attrs["version"] = weather_version(meta)
+        entry = {"data": data, "meta": meta, "nbytes": int(data.memory_usage(deep=True).sum())}
+        with self.lock:
+            previous = self.entries.pop(station_id, None)
+            if previous is not None:
+                self.size -= previous["nbytes"]
+            self.entries[station_id] = entry
+            self.size += entry["nbytes"]
+            while self.size > self.max_bytes and len(self.entries) > 1:
+                _, evicted = self.entries.popitem(last=False)
+                self.size -= evicted["nbytes"]
+        return entry
+
+    def clear(self):
+        with self.lock:
+            self.entries.clear()
+            self.size = 0
+
+weather_cache = WeatherCache(WEATHER_CACHE_BYTES)
+
+def weather_version(meta):
+    # Identifies a station's stored rows (and survives filtering through
+    # DataFrame.attrs): the upstream validators when there are any, otherwise
+    # the time they were fetched.
+    validators = [meta.get(key) for key in ("source", "etag", "last_modified", "length")]
+    if not any(validators[1:]):
+        validators.append(meta.get("checked_at"))
+    return json.dumps(validators)
+
+class ResponseCache:
+    # LRU of encoded response bodies bounded by their total size; entries also
+    # expire after ttl seconds.
+    def __init__(self, max_bytes, ttl):
+        self.max_bytes = max_bytes
+        self.ttl = ttl
+        self.entries = OrderedDict()
+        self.size = 0
+        self.lock = threading.Lock()
+
+    def get(self, key):
+        with self.lock:
+            entry = self.entries.get(key)
+            if entry is None:
+                return None
+            if entry["expires"] <= time.monotonic():
+                del self.entries[key]
+                self.size -= len(entry["body"])
+                return None
+            self.entries.move_to_end(key)
+            return entry
+
+    def put(self, key, body, etag):
+        entry = {"body": body, "etag": etag, "expires": time.monotonic() + self.ttl}
+        with self.lock:
+            previous = self.entries.pop(key, None)
+            if previous is not None:
+                self.size -= len(previous["body"])
+            self.entries[key] = entry
+            self.size += len(body)
+            while self.size > self.max_bytes and self.entries:
+                _, evicted = self.entries.popitem(last=False)
+                self.size -= len(evicted["body"])
+        return entry
+
+    def clear(self):
+        with self.lock:
+            self.entries.clear()
+            self.size = 0
+
+stations_response_cache = ResponseCache(RESPONSE_CACHE_BYTES, RESPONSE_CACHE_TTL_SECONDS)
+
+def body_etag(*parts):
+    digest = hashlib.blake2b(digest_size=16)
+    for part in parts:
+        digest.update(part if isinstance(part, bytes) else json.dumps(part, sort_keys=True).encode("utf-8"))
+        digest.update(b"\0")
+    return digest.hexdigest()
+
+def conditional_response(etag, build, last_modified=None, vary=None):
+    # If-None-Match is answered from the validator alone, before the body is
+    # built or streamed.
+    if request.if_none_match.contains_weak(etag):
+        response = Response(status=304)
+    else:
+        response = build()
+    response.set_etag(etag)
+    response.headers["Cache-Control"] = f"public, max-age={RESPONSE_MAX_AGE_SECONDS}"
+    if last_modified is not None:
+        response.last_modified = last_modified
+    if vary is not None:
+        response.headers["Vary"] = vary
+    return response
+
+def weather_cache_path(station_id):
+    if not re.fullmatch(r"[A-Za-z0-9_-]+", station_id):
+        return None
+    return os.path.join(CACHE_DIR, "weather", f"{station_id}.npz")
+
+def read_cached_weather(station_id, start_year=None, end_year=None, elements=None):
+    # Rows are stored as one npz member per calendar year; NpzFile decompresses
+    # members lazily, so a year range only reads its own partitions.
+    path = weather_cache_path(station_id)
+    if path is None:
+        return None
+    try:
+        with np.load(path) as stored:
+            meta = json.loads(stored["meta"].item())
+            element_values = np.array([value.decode("utf-8") for value in stored["element_values"]], dtype=object)
+            years = stored["years"]
+            if start_year is not None:
+                years = years[years >= start_year]
+            if end_year is not None:
+                years = years[years <= end_year]
+            records = np.concatenate([stored["empty"]] + [stored[f"y{year}"] for year in years])
+        if elements is not None:
+            records = records[np.isin(element_values[records["element"]], elements)]
+        data = pd.DataFrame({
+            "DATE": records["date"],
+            "ELEMENT": element_values[records["element"]],
+            "VALUE": records["value"],
+        })
+        data.attrs["version"] = weather_version(meta)
+        return data, meta
+    except FileNotFoundError:
+        return None
+    except OSError as e:
+        print(f"Ignoring unreadable weather cache for station {station_id}:", e)
+        return None
+    except (ValueError, KeyError, zipfile.BadZipFile) as e:
+        # Files are replaced atomically, so a malformed one is a writer bug;
+        # treating it as a miss would hide it behind a download on every lookup.
+        raise ValueError(f"Weather cache {path} for station {station_id} is malformed: {e}") from e
+
+def write_cached_weather(station_id, data, meta, climatology):
+    path = weather_cache_path(station_id)
+    if path is None:
+        return
+    try:
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        # Rows without a date have no year partition to go to.
+        data = data[data["DATE"].notna()]
+        codes, uniques = pd.factorize(data["ELEMENT"])
+        dates = data["DATE"].to_numpy()
+        values = data["VALUE"].to_numpy()
+        records = np.empty(len(data), dtype=[("date", dates.dtype), ("element", np.int8), ("value", values.dtype)])
+        records["date"], records["element"], records["value"] = dates, codes, values
+        years = data["DATE"].dt.year.to_numpy().astype(np.int64)
+        order = np.argsort(years, kind="stable")
+        partition_years, starts = np.unique(years[order], return_index=True)
+        partitions = {
+            f"y{year}": records[order[start:stop]]
+            for year, start, stop in zip(partition_years, starts, np.append(starts[1:], len(order)))
+        }
+        tmp_path = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+        with open(tmp_path, "wb") as f:
+            np.savez_compressed(
+                f,
+                years=partition_years.astype(np.int16),
+                empty=records[:0],
+                element_values=np.array([value.encode("utf-8") for value in uniques], dtype="S"),
+                meta=np.array(json.dumps(meta)),
+                climatology=climatology,
+                **partitions,
+            )
+        os.replace(tmp_path, path)
+    except OSError as e:
+        print(f"Could not write weather cache for station {station_id}:", e)
+
+def lookup_cached_weather(station_id):
+    entry = weather_cache.get(station_id)
+    if entry is not None:
+        return entry
+    stored = read_cached_weather(station_id)
+    if stored is None:
+        return None
+    return weather_cache.put(station_id, *stored)
+
+def cached_weather_range(station_id, start_year=None, end_year=None, elements=None):
+    # A resident frame is filtered in memory; otherwise only the partitions in
+    # the range are read from disk and, being partial, are not kept resident.
+    if start_year is None and end_year is None and elements is None:
+        return lookup_cached_weather(station_id)
+    entry = weather_cache.get(station_id)
+    if entry is not None:
+        return {"data": select_weather_data(entry["data"], start_year, end_year, elements), "meta": entry["meta"]}
+    stored = read_cached_weather(station_id, start_year, end_year, elements)
+    if stored is None:
+        return None
+    return {"data": stored[0], "meta": stored[1]}
+
+def select_weather_data(data, start_year=None, end_year=None, elements=None):
+    if data is None or data.empty or (start_year is None and end_year is None and elements is None):
+        return data
+    with timed_stage("filter", "weather"):
+        keep = np.ones(len(data), dtype=bool)
+        if start_year is not None or end_year is not None:
+            years = data["DATE"].dt.year.to_numpy()
+            if start_year is not None:
+                keep &= years >= start_year
+            if end_year is not None:
+                keep &= years <= end_year
+        if elements is not None:
+            keep &= data["ELEMENT"].isin(elements).to_numpy()
+        return data[keep]
+
+def store_cached_weather(station_id, data, meta, climatology=None):
+    weather_cache.put(station_id, data, meta)
+    write_cached_weather(station_id, data, meta, build_climatology(data) if climatology is None else climatology)
+
+def build_climatology(weather_data, previous=None, since_year=None):
+    # Monthly sums and counts of the raw tenths-of-a-degree values per element:
+    # annual means and both seasonal conventions fold out of them exactly, for
+    # any year range. With a previous table, only the months from since_year on
+    # are recomputed.
+    # NaT would otherwise land in a bogus 1970 row.
+    data = weather_data[weather_data["ELEMENT"].isin(TEMPERATURE_ELEMENTS) & weather_data["DATE"].notna()]
+    dates = data["DATE"].to_numpy()
+    years = dates.astype("datetime64[Y]").astype(np.int64) + 1970
+    if previous is not None and since_year is not None:
+        recent = years >= since_year
+        data, dates, years = data[recent], dates[recent], years[recent]
+        previous = previous[previous["year"] < since_year]
+    months = dates.astype("datetime64[M]").astype(np.int64) % 12
+    elements = pd.Categorical(data["ELEMENT"], categories=TEMPERATURE_ELEMENTS).codes.astype(np.int64)
+    keys, inverse = np.unique((elements * 10000 + years) * 12 + months, return_inverse=True)
+    table = np.empty(len(keys), dtype=CLIMATOLOGY_DTYPE)
+    table["element"] = keys // 120000
+    table["year"] = keys // 12 % 10000
+    table["month"] = keys % 12 + 1
+    table["sum"] = np.bincount(inverse, weights=data["VALUE"].to_numpy(dtype=np.float64), minlength=len(keys))
+    table["count"] = np.bincount(inverse, minlength=len(keys))
+    if previous is not None and since_year is not None:
+        table = np.sort(np.concatenate([previous, table]), order=["element", "year", "month"])
+    return table
+
+def climatology_summary(table, latitude_positive=True, start_year=None, end_year=None):
+    # Same output as aggregate_weather_data on the matching daily rows.
+    if start_year is not None and end_year is not None:
+        table = table[(table["year"] >= start_year) & (table["year"] <= end_year)]
+    season_names = NORTHERN_SEASONS if latitude_positive else SOUTHERN_SEASONS
+    summary = {}
+    for element, key in (("TMIN", "Tmin"), ("TMAX", "Tmax")):
+        rows = table[table["element"] == TEMPERATURE_ELEMENTS.index(element)]
+        years = rows["year"].astype(np.int64)
+        months = rows["month"].astype(np.int64)
+        sums, counts = rows["sum"].astype(np.float64), rows["count"].astype(np.float64)
+        annual_years, inverse = np.unique(years, return_inverse=True)
+        means = np.bincount(inverse, sums, len(annual_years)) / np.bincount(inverse, counts, len(annual_years)) / 10
+        summary[f"annual{key}"] = [{"year": int(year), "value": float(value)} for year, value in zip(annual_years, means)]
+        season_keys = (years + ((months == 12) & latitude_positive)) * 4 + MONTH_SEASON[months]
+        season_keys, inverse = np.unique(season_keys, return_inverse=True)
+        means = np.bincount(inverse, sums, len(season_keys)) / np.bincount(inverse, counts, len(season_keys)) / 10
+        summary[f"seasonal{key}"] = [
+            {"season": season_names[season_key % 4], "year": int(season_key // 4), "value": float(value)}
+            for season_key, value in zip(season_keys, means)
+            if not (end_year is not None and season_names[season_key % 4] == "Winter" and season_key // 4 > end_year)
+        ]
+    return summary
+
+def read_cached_climatology(station_id):
+    path = weather_cache_path(station_id)
+    if path is None:
+        return None, None
+    try:
+        with np.load(path) as stored:
+            return stored["climatology"], json.loads(stored["meta"].item())
+    except (OSError, ValueError, KeyError) as e:
+        if not isinstance(e, FileNotFoundError):
+            print(f"Ignoring unreadable climatology for station {station_id}:", e)
+        return None, None
+
+def read_climatology(station_id, end_year=None):
+    # A mirrored station's table is always current. A cached station's table is
+    # as current as its data: used while that is fresh, or for ranges that end
+    # before the year it was last checked, which can no longer change.
+    path = mirror_path(station_id)
+    if path is None:
+        return None
+    try:
+        return np.load(os.path.join(path, "climatology.npy"))
+    except FileNotFoundError:
+        pass
+    except (OSError, ValueError) as e:
+        print(f"Ignoring unreadable mirror climatology for station {station_id}:", e)
+    table, meta = read_cached_climatology(station_id)
+    if table is None:
+        return None
+    checked_at = meta["checked_at"]
+    if time.time() - checked_at >= WEATHER_MAX_AGE_SECONDS and (end_year is None or end_year >= time.gmtime(checked_at).tm_year):
+        return None
+    return table
+
+def lookup_climatology_summary(station_id, latitude_positive=True, start_year=None, end_year=None):
+    table = read_climatology(station_id, end_year)
+    if table is None or len(table) == 0:
+        count_cache("climatology", "miss")
+        return None
+    count_cache("climatology", "hit")
+    return climatology_summary(table, latitude_positive, start_year, end_year)
+
+def mirror_path(station_id, mirror_dir=None):
+    if not re.fullmatch(r"[A-Za-z0-9_-]+", station_id):
+        return None
+    return os.path.join(mirror_dir or MIRROR_DIR, station_id)
+
+def read_mirrored_weather(station_id, start_year=None, end_year=None, elements=None):
+    # Mirrored rows are sorted by date and stored one .npy file per column, with
+    # each year a contiguous row range; DATE and VALUE are memory-mapped and
+    # sliced, so a year range is served straight from the page cache.
+    path = mirror_path(station_id)
+    if path is None:
+        return None
+    try:
+        with open(os.path.join(path, "meta.json")) as f:
+            meta = json.load(f)
+        columns = {name: np.load(os.path.join(path, f"{name}.npy"), mmap_mode="r") for name in ("DATE", "ELEMENT", "VALUE")}
+    except FileNotFoundError:
+        return None
+    except (OSError, ValueError, KeyError) as e:
+        print(f"Ignoring unreadable mirror for station {station_id}:", e)
+        return None
+    years, offsets = np.array(meta["years"], dtype=np.int64), meta["offsets"]
+    first = offsets[np.searchsorted(years, start_year)] if start_year is not None else 0
+    last = offsets[np.searchsorted(years, end_year, side="right")] if end_year is not None else offsets[-1]
+    rows = slice(first, max(first, last))
+    element_values = np.array(meta["elements"], dtype=object)
+    data = pd.DataFrame({
+        "DATE": columns["DATE"][rows],
+        "ELEMENT": element_values[columns["ELEMENT"][rows]],
+        "VALUE": columns["VALUE"][rows],
+    }, copy=False)
+    data.attrs["version"] = json.dumps(["mirror", meta["ingested_at"]])
+    if elements is not None:
+        data = data[data["ELEMENT"].isin(elements).to_numpy()]
+    return data
+
+def write_mirrored_weather(station_id, data, mirror_dir=None):
+    path = mirror_path(station_id, mirror_dir)
+    if path is None:
+        return
+    codes, uniques = pd.factorize(data["ELEMENT"])
+    dates = data["DATE"].to_numpy()
+    order = np.lexsort((codes, dates))
+    dates = dates[order]
+    years = dates.astype("datetime64[Y]").astype(np.int64) + 1970
+    partition_years, starts = np.unique(years, return_index=True)
+    meta = {
+        "elements": [str(value) for value in uniques],
+        "years": partition_years.tolist(),
+        "offsets": starts.tolist() + [len(dates)],
+        "ingested_at": time.time(),
+    }
+    tmp_path = f"{path}.{os.getpid()}.tmp"
+    shutil.rmtree(tmp_path, ignore_errors=True)
+    os.makedirs(tmp_path)
+    np.save(os.path.join(tmp_path, "DATE.npy"), dates)
+    np.save(os.path.join(tmp_path, "ELEMENT.npy"), codes[order].astype(np.int8))
+    np.save(os.path.join(tmp_path, "VALUE.npy"), data["VALUE"].to_numpy()[order])
+    np.save(os.path.join(tmp_path, "climatology.npy"), build_climatology(data))
+    with open(os.path.join(tmp_path, "meta.json"), "w") as f:
+        json.dump(meta, f)
+    # A station is swapped in as a whole directory; a reader that races the
+    # swap finds no mirror for a moment and takes the regular path.
+    old_path = f"{path}.{os.getpid()}.old"
+    if os.path.exists(path):
+        os.replace(path, old_path)
+    os.replace(tmp_path, path)
+    shutil.rmtree(old_path, ignore_errors=True)
+
+def iter_dly_sources(source):
+    # (station_id, .dly bytes) from a ghcnd_all tar archive or a directory.
+    if os.path.isdir(source):
+        for name in sorted(os.listdir(source)):
+            if name.endswith(".dly"):
+                with open(os.path.join(source, name), "rb") as f:
+                    yield name[:-len(".dly")], f.read()
+        return
+    with tarfile.open(source, "r|*") as archive:
+        for member in archive:
+            name = os.path.basename(member.name)
+            if member.isfile() and name.endswith(".dly"):
+                yield name[:-len(".dly")], archive.extractfile(member).read()
+
+def ingest_mirror_station(station_id, data, mirror_dir):
+    weather = parse_ghcnd_dly_from_string(data, TEMPERATURE_ELEMENTS)
+    write_mirrored_weather(station_id, weather, mirror_dir)
+    return len(weather)
+
+def ingest_mirror(source, processes=None, mirror_dir=None):
+    # The archive is read sequentially here and the stations are parsed and
+    # written by worker processes, with at most two stations per worker in
+    # flight so memory stays bounded on the full ~30 GB archive.
+    mirror_dir = mirror_dir or MIRROR_DIR
+    os.makedirs(mirror_dir, exist_ok=True)
+    processes = available_cpus() if processes is None else processes
+    executor = None
+    if processes > 0:
+        executor = ProcessPoolExecutor(max_workers=processes, mp_context=multiprocessing.get_context("spawn"))
+    stations = rows = 0
+    pending = set()
+    try:
+        for station_id, data in iter_dly_sources(source):
+            if executor is None:
+                rows += ingest_mirror_station(station_id, data, mirror_dir)
+                stations += 1
                 continue
-            records.append({"DATE": date, "ELEMENT": element, "VALUE": value})
-    df = pd.DataFrame(records)
-    return df
+            pending.add(executor.submit(ingest_mirror_station, station_id, data, mirror_dir))
+            if len(pending) >= 2 * processes:
+                done, pending = wait(pending, return_when=FIRST_COMPLETED)
+                rows += sum(future.result() for future in done)
+                stations += len(done)
+        rows += sum(future.result() for future in pending)
+        stations += len(pending)
+    finally:
+        if executor is not None:
+            executor.shutdown(cancel_futures=True)
+    print(f"Mirrored {stations} stations ({rows} rows) into {mirror_dir}.")
+    return stations, rows
+
+@app.cli.command("ingest-mirror", help="Convert ghcnd_all.tar.gz or a directory of .dly files into the offline mirror.")
+@click.argument("source", type=click.Path(exists=True))
+@click.option("--processes", type=int, default=None, help="Worker processes (default: all cores, 0 parses in-process).")
+@click.option("--mirror-dir", default=None, help="Target directory (default: GHCN_MIRROR_DIR).")
+def ingest_mirror_command(source, processes, mirror_dir):
+    ingest_mirror(source, processes, mirror_dir)
+
+def rebuild_climatology(station_id):
+    path = mirror_path(station_id)
+    if path is not None and os.path.isdir(path):
+        data = read_mirrored_weather(station_id)
+        if data is None:
+            return False
+        tmp_path = os.path.join(path, f"climatology.{os.getpid()}.tmp.npy")
+        np.save(tmp_path, build_climatology(data))
+        os.replace(tmp_path, os.path.join(path, "climatology.npy"))
+        return True
+    stored = read_cached_weather(station_id)
+    if stored is None:
+        return False
+    write_cached_weather(station_id, *stored, build_climatology(stored[0]))
+    return True
 
-def fetch_weather_data(station_id):
+def build_climatology_tables(processes=None):
+    # Batch (re)build for every mirrored and cached station, e.g. for stores
+    # written before their tables existed; afterwards every store of new data
+    # keeps its station's table current.
+    station_ids = set()
+    if os.path.isdir(MIRROR_DIR):
+        station_ids.update(name for name in os.listdir(MIRROR_DIR) if re.fullmatch(r"[A-Za-z0-9_-]+", name))
+    weather_dir = os.path.join(CACHE_DIR, "weather")
+    if os.path.isdir(weather_dir):
+        station_ids.update(name[:-len(".npz")] for name in os.listdir(weather_dir) if name.endswith(".npz"))
+    station_ids = sorted(station_ids)
+    processes = available_cpus() if processes is None else processes
+    if processes > 0:
+        with ProcessPoolExecutor(max_workers=processes, mp_context=multiprocessing.get_context("spawn")) as executor:
+            built = sum(executor.map(rebuild_climatology, station_ids, chunksize=32))
+    else:
+        built = sum(map(rebuild_climatology, station_ids))
+    print(f"Built climatology tables for {built} of {len(station_ids)} stations.")
+    return built
+
+@app.cli.command("build-climatology", help="Precompute the climatology table of every mirrored and cached station.")
+@click.option("--processes", type=int, default=None, help="Worker processes (default: all cores, 0 builds in-process).")
+def build_climatology_command(processes):
+    build_climatology_tables(processes)
+
+def weather_validators(response, source):
+    return {
+        "source": source,
+        "etag": response.headers.get("ETag"),
+        "last_modified": response.headers.get("Last-Modified"),
+        "checked_at": time.time(),
+    }
+
+def conditional_headers(meta, source):
+    headers = {}
+    if meta is not None and meta.get("source") == source:
+        if meta.get("etag"):
+            headers["If-None-Match"] = meta["etag"]
+        if meta.get("last_modified"):
+            headers["If-Modified-Since"] = meta["last_modified"]
+    return headers
+
+def tracked_chunks(chunks, position):
+    # Counts the body bytes and keeps the last WEATHER_SYNC_TAIL_BYTES of them,
+    # which is what a later range request resumes from and checks against. Also
+    # adds up the time spent waiting on the connection for them.
+    chunks = iter(chunks)
+    while True:
+        start = time.perf_counter()
+        chunk = next(chunks, None)
+        position["waited"] += time.perf_counter() - start
+        if chunk is None:
+            return
+        position["length"] += len(chunk)
+        position["received"] += len(chunk)
+        position["tail"] = (position["tail"] + chunk)[-WEATHER_SYNC_TAIL_BYTES:]
+        yield chunk
+
+def body_position(length=0):
+    return {"length": length, "tail": b"", "received": 0, "waited": 0.0}
+
+def record_transfer(source, position, seconds, rows):
+    # Parsing consumes the body as it arrives, so the time spent waiting on the
+    # connection counts as download and the rest as parse.
+    record_stage("download", position["waited"], source)
+    record_stage("parse", max(seconds - position["waited"], 0.0), source)
+    metrics.inc("ghcn_download_bytes_total", position["received"], source=source)
+    metrics.inc("ghcn_parsed_rows_total", rows, source=source)
+
+def synced_validators(response, position):
+    return dict(weather_validators(response, "csv"), length=position["length"], tail=position["tail"].decode("latin-1"))
+
+def read_full_csv(response):
+    position = body_position()
+    start = time.perf_counter()
+    data = parse_ghcnd_csv_stream(tracked_chunks(response.iter_content(HTTP_CHUNK_BYTES), position), TEMPERATURE_ELEMENTS)
+    record_transfer("csv", position, time.perf_counter() - start, len(data))
+    return data, synced_validators(response, position)
 
+def sync_weather_data(station_id, cached):
+    # by_station CSVs only grow at the end, so a cached copy asks for the bytes
+    # from its stored tail on and parses just its last line plus whatever was
+    # appended. Returns None when that cannot be trusted (an unexpected range
+    # response, or the bytes before the stored last line changed) and the
+    # caller should download the file in full; otherwise (data, meta, first
+    # year the appended rows touch).
+    meta = cached["meta"]
+    if meta.get("source") != "csv" or "length" not in meta:
+        return None
+    tail = meta["tail"].encode("latin-1")
+    line_start = tail.rfind(b"\n", 0, len(tail) - 1) + 1
+    if line_start == 0:
+        return None
+    offset = meta["length"] - len(tail)
+    headers = dict(conditional_headers(meta, "csv"), Range=f"bytes={offset}-")
+    # Byte offsets refer to the file itself, not to a compressed transfer.
+    headers["Accept-Encoding"] = "identity"
+    print(f"Syncing weather data for station {station_id} from byte {offset}...")
+    response = http_get(f"{GHCN_BASE_URL}by_station/{station_id}.csv", headers=headers, stream=True)
+    with closing(response):
+        if response.status_code == 304:
+            print(f"CSV data for station {station_id} not modified upstream.")
+            return None, weather_validators(response, "csv"), None
+        if response.status_code == 200:
+            print(f"Range ignored for station {station_id}; using the full CSV body.")
+            return (*read_full_csv(response), None)
+        if response.status_code != 206 or not response.headers.get("Content-Range", "").startswith(f"bytes {offset}-"):
+            return None
+        position = body_position(offset)
+        start = time.perf_counter()
+        body = b"".join(tracked_chunks(response.iter_content(HTTP_CHUNK_BYTES), position))
+        if not body.startswith(tail[:line_start]):
+            print(f"CSV for station {station_id} was rewritten upstream.")
+            return None
+        appended = parse_ghcnd_csv_stream([body[line_start:]], TEMPERATURE_ELEMENTS)
+        record_transfer("csv_range", position, time.perf_counter() - start, len(appended))
+        if "DATE" not in appended.columns:
+            return None
+        # The re-read last line replaces its old copy; new days go at the end.
+        merged = pd.concat([cached["data"], appended], ignore_index=True)
+        merged = merged[~merged.duplicated(["DATE", "ELEMENT"], keep="last")].reset_index(drop=True)
+        print(f"Synced {len(body) - len(tail)} new bytes for station {station_id}.")
+        since_year = int(appended["DATE"].dt.year.min()) if not appended.empty else None
+        return merged, synced_validators(response, position), since_year
+
+def download_weather_data(station_id, cached_meta=None):
+    # Returns (data, meta); data is None with a meta when upstream answered 304,
+    # and both are None when neither source is available.
     print(f"Fetching weather data for station {station_id} (CSV)...")
     csv_url = f"{GHCN_BASE_URL}by_station/{station_id}.csv"
-    response = requests.get(csv_url)
-    if response.status_code == 200:
-        print(f"CSV data for station {station_id} fetched successfully.")
-        df = parse_ghcnd_csv_from_string(response.text)
-        return df
-    else:
-        print(f"CSV not available for station {station_id} (HTTP {response.status_code}). Trying .dly file...")
-        dly_url = f"{GHCN_BASE_URL}all/{station_id}.dly"
-        response2 = requests.get(dly_url)
+    response = http_get(csv_url, headers=conditional_headers(cached_meta, "csv"), stream=True)
+    with closing(response):
+        if response.status_code == 304:
+            print(f"CSV data for station {station_id} not modified upstream.")
+            return None, weather_validators(response, "csv")
+        if response.status_code == 200:
+            print(f"CSV data for station {station_id} fetched successfully.")
+            return read_full_csv(response)
+
+    print(f"CSV not available for station {station_id} (HTTP {response.status_code}). Trying .dly file...")
+    dly_url = f"{GHCN_BASE_URL}all/{station_id}.dly"
+    start = time.perf_counter()
+    response2 = http_get(dly_url, headers=conditional_headers(cached_meta, "dly"), stream=True)
+    with closing(response2):
+        if response2.status_code == 304:
+            print(f".dly data for station {station_id} not modified upstream.")
+            return None, weather_validators(response2, "dly")
         if response2.status_code == 200:
             print(f".dly data for station {station_id} fetched successfully.")
-            df = parse_ghcnd_dly_from_string(response2.text)
-            return df
+            content = response2.content
+            record_stage("download", time.perf_counter() - start, "dly")
+            metrics.inc("ghcn_download_bytes_total", len(content), source="dly")
+            with timed_stage("parse", "dly"):
+                data = parse_ghcnd_dly_from_string(content, TEMPERATURE_ELEMENTS)
+            metrics.inc("ghcn_parsed_rows_total", len(data), source="dly")
+            return data, weather_validators(response2, "dly")
+    print(f"Failed to fetch weather data for station {station_id} from both CSV and .dly sources. HTTP status for .dly: {response2.status_code}")
+    return None, None
+
+def fetch_weather_data(station_id, start_year=None, end_year=None, elements=None):
+    data = fetch_local_weather_data(station_id, start_year, end_year, elements)
+    if data is not None:
+        return data
+    return fetch_remote_weather_data(station_id, start_year, end_year, elements)
+
+def fetch_local_weather_data(station_id, start_year=None, end_year=None, elements=None):
+    # The mirror and fresh cached data, read only for the requested years and
+    # elements. Never touches the network, so request threads call it directly.
+    mirrored = read_mirrored_weather(station_id, start_year, end_year, elements)
+    if mirrored is not None:
+        print(f"Weather data for station {station_id} served from the offline mirror.")
+        count_cache("mirror", "hit")
+        return mirrored
+    cached = cached_weather_range(station_id, start_year, end_year, elements)
+    if cached is not None and time.time() - cached["meta"]["checked_at"] < WEATHER_MAX_AGE_SECONDS:
+        print(f"Weather data for station {station_id} served from cache.")
+        count_cache("weather", "hit")
+        return cached["data"]
+    count_cache("weather", "miss" if cached is None else "stale")
+    return None
+
+def fetch_remote_weather_data(station_id, start_year=None, end_year=None, elements=None):
+    # A download always refreshes the full history, since that is what the
+    # cache stores, and is narrowed afterwards.
+    data = single_flight.do(("weather", station_id), fetch_weather_data_uncoalesced, station_id)
+    if data is not None and data.empty:
+        # No rows at all (or an unparseable body) is "no data" for any range.
+        return None
+    return select_weather_data(data, start_year, end_year, elements)
+
+def fetch_weather_data_uncoalesced(station_id):
+    cached = lookup_cached_weather(station_id)
+    if cached is not None and time.time() - cached["meta"]["checked_at"] < WEATHER_MAX_AGE_SECONDS:
+        print(f"Weather data for station {station_id} served from cache.")
+        return cached["data"]
+
+    try:
+        synced = sync_weather_data(station_id, cached) if cached is not None else None
+        if synced is not None:
+            data, meta, since_year = synced
         else:
-            print(f"Failed to fetch weather data for station {station_id} from both CSV and .dly sources. HTTP status for .dly: {response2.status_code}")
+            data, meta = download_weather_data(station_id, cached["meta"] if cached is not None else None)
+            since_year = None
+    except requests.RequestException as e:
+        print(f"Download of weather data for station {station_id} failed:", e)
+        data, meta = None, None
+    if meta is None:
+        if cached is not None:
+            print(f"Serving stale cached weather data for station {station_id}.")
+            return cached["data"]
+        return None
+    if data is None:
+        # Not modified: keep the stored frame and only refresh its validators.
+        meta = dict(cached["meta"], checked_at=meta["checked_at"])
+        store_cached_weather(station_id, cached["data"], meta, read_cached_climatology(station_id)[0])
+        return cached["data"]
+    if not data.empty:
+        climatology = None
+        if since_year is not None:
+            previous = read_cached_climatology(station_id)[0]
+            climatology = build_climatology(data, previous, since_year) if previous is not None else None
+        store_cached_weather(station_id, data, meta, climatology)
+    return data
+
+def station_records(stations_df):
+    # Coordinates are held as float32; round them back to the catalog's own
+    # precision so the JSON does not show float32 noise digits.
+    precision = {'LATITUDE': 4, 'LONGITUDE': 4, 'ELEVATION': 1}
+    precision = {column: digits for column, digits in precision.items() if column in stations_df.columns}
+    stations_df = stations_df.astype(dict.fromkeys(precision, np.float64)).round(precision)
+    return stations_df.to_dict(orient="records")
+
+def load_coverage_index():
+    if preload_running:
+        # Never wait on the preload; the index may still be stations-only.
+        return station_index
+    stations_df = load_stations()
+    if stations_df is None or stations_df.empty:
+        return None
+    index = get_station_index(stations_df)
+    if index.first_year is None:
+        inventory_df = load_inventory()
+        if inventory_df is None or inventory_df.empty:
+            print("No inventory data available")
             return None
+        index = get_station_index(stations_df, inventory_df)
+    return index
+
+def station_coverage(station_ids, start_year, end_year, index):
+    # Inventory years answer whether a station can have data in the range;
+    # a locally cached frame replaces that with exact per-element counts.
+    positions = index.locate(station_ids) if index is not None else np.full(len(station_ids), -1)
+    results = []
+    for station_id, position in zip(station_ids, positions):
+        counts = None
+        cached = cached_weather_range(station_id, start_year, end_year)
+        if cached is not None:
+            counts = cached["data"]["ELEMENT"].value_counts()
+        elements = {}
+        for element_position, element in enumerate(TEMPERATURE_ELEMENTS):
+            first_year = last_year = None
+            if position >= 0 and index.element_years is not None:
+                first_year, last_year = (int(year) for year in index.element_years[position, element_position])
+            elements[element] = {
+                "first_year": first_year,
+                "last_year": last_year,
+                "records": int(counts.get(element, 0)) if counts is not None else None,
+            }
+        if counts is not None:
+            covered = any(entry["records"] > 0 for entry in elements.values())
+        else:
+            covered = any(
+                entry["first_year"] is not None and entry["first_year"] <= end_year and entry["last_year"] >= start_year
+                for entry in elements.values()
+            )
+        results.append({"ID": station_id, "covered": covered, "elements": elements})
+    return results
+
+# Upstream downloads run on a dedicated, bounded pool: request threads only
+# wait on them with a deadline, so a slow NOAA transfer can never hold more
+# than UPSTREAM_CONCURRENCY connections or block a request past its timeout.
+upstream_executor = ThreadPoolExecutor(max_workers=UPSTREAM_CONCURRENCY, thread_name_prefix="upstream")
+
+def fetch_weather_data_bounded(station_id, timeout=None, **filters):
+    # Only the download waits for a slot on the upstream pool, so cached
+    # stations are still answered while slow NOAA downloads fill it.
+    data = fetch_local_weather_data(station_id, **filters)
+    if data is not None:
+        return data
+    future = submit_upstream(fetch_remote_weather_data, station_id, **filters)
+    return future.result(UPSTREAM_TIMEOUT_SECONDS if timeout is None else timeout)
 
 @app.route('/get_stations', methods=['GET'])
 def get_stations():
@@ -175,33 +1807,194 @@ def get_stations():
     except (TypeError, ValueError) as e:
         print("Invalid parameters for get_stations request:", e)
         return jsonify({"error": "Invalid parameters"}), 400
+    if not (isfinite(latitude) and isfinite(longitude) and isfinite(radius_km)) or radius_km < 0:
+        print(f"Invalid coordinates or radius for get_stations request: ({latitude}, {longitude}), {radius_km} km.")
+        return jsonify({"error": "Invalid parameters"}), 400
+    # Nearby clicks share one cached answer: the query runs on the rounded point.
+    latitude = round(latitude, COORDINATE_PRECISION)
+    longitude = round(longitude, COORDINATE_PRECISION)
 
-    stations_df = fetch_and_filter_stations(latitude, longitude, radius_km)
-    if stations_df is None or stations_df.empty:
-         return jsonify([])
-
-    inventory_df = load_inventory()
-    if inventory_df is None or inventory_df.empty:
-         print("No inventory data available")
-         return jsonify([])
-
-    valid_inventory_tmin = inventory_df[
-        (inventory_df['ELEMENT'] == 'TMIN') &
-        (inventory_df['FIRSTYEAR'].astype(int) <= start_year) &
-        (inventory_df['LASTYEAR'].astype(int) >= end_year)
-    ]
-    valid_inventory_tmax = inventory_df[
-        (inventory_df['ELEMENT'] == 'TMAX') &
-        (inventory_df['FIRSTYEAR'].astype(int) <= start_year) &
-        (inventory_df['LASTYEAR'].astype(int) >= end_year)
-    ]
-    valid_station_ids = set(valid_inventory_tmin['ID']).intersection(set(valid_inventory_tmax['ID']))
-
-    stations_df = stations_df[stations_df['ID'].isin(valid_station_ids)]
-    stations_df = stations_df.head(station_count)
-    stations = stations_df.to_dict(orient="records")
+    index = load_coverage_index()
+    if index is None:
+        if preload_running:
+            return jsonify({"error": "Station catalog is still loading"}), 503, {"Retry-After": "2"}
+        return jsonify([])
+    # The generation travels with the index, so a refresh that lands while
+    # this request runs cannot file its answer under the new catalog's key.
+    key = (index.generation, latitude, longitude, radius_km, station_count, start_year, end_year)
+    versions = [version for version in (index.versions or {}).values() if version is not None]
+    last_modified = max(versions) if versions else None
+    entry = stations_response_cache.get(key) if index.first_year is not None else None
+    count_cache("stations_response", "hit" if entry is not None else "miss")
+    if entry is not None:
+        print(f"Returning cached stations for coordinates ({latitude}, {longitude}) with radius {radius_km} km.")
+        return conditional_response(entry["etag"], lambda: Response(entry["body"], mimetype="application/json"), last_modified)
+    stations_df = index.stations
+    with timed_stage("filter", "stations"):
+        if index.first_year is None:
+            # Stations-only index from an unfinished preload: nearest stations are
+            # returned without the TMIN/TMAX coverage check.
+            positions, distances = index.query_nearest(latitude, longitude, station_count, radius_km)
+            headers = {"X-Catalog-Stage": "stations"}
+        else:
+            positions, distances = index.query_nearest(
+                latitude, longitude, station_count, radius_km,
+                lambda candidates: index.covers(candidates, start_year, end_year)
+            )
+            headers = {}
+    with timed_stage("serialize", "stations"):
+        stations_df = stations_df.iloc[positions].assign(DISTANCE=distances)
+        stations = station_records(stations_df)
+        body = jsonify(stations).get_data()
     print(f"Returning {len(stations)} stations for coordinates ({latitude}, {longitude}) with radius {radius_km} km that have TMIN/TMAX data between {start_year} and {end_year}.")
-    return jsonify(stations)
+    if headers:
+        return Response(body, mimetype="application/json", headers=headers)
+    entry = stations_response_cache.put(key, body, body_etag(body))
+    return conditional_response(entry["etag"], lambda: Response(body, mimetype="application/json"), last_modified)
+
+@app.route('/get_station_coverage', methods=['GET', 'POST'])
+def get_station_coverage():
+    params = (request.get_json(silent=True) or {}) if request.method == 'POST' else request.args
+    if request.method == 'POST' and not isinstance(params, dict):
+        print("get_station_coverage request body is not a JSON object.")
+        return jsonify({"error": "Request body must be a JSON object"}), 400
+    try:
+        station_ids = params.get('station_ids') or []
+        if isinstance(station_ids, str):
+            station_ids = [station_id for station_id in station_ids.split(',') if station_id]
+        station_ids = [str(station_id) for station_id in station_ids]
+        start_year = int(params.get('start_year'))
+        end_year = int(params.get('end_year'))
+    except (TypeError, ValueError) as e:
+        print("Invalid parameters for get_station_coverage request:", e)
+        return jsonify({"error": "Invalid parameters"}), 400
+    if not station_ids:
+        return jsonify({"error": "No station IDs provided"}), 400
+    if len(station_ids) > MAX_COVERAGE_STATIONS:
+        return jsonify({"error": f"At most {MAX_COVERAGE_STATIONS} station IDs per request"}), 400
+
+    coverage = station_coverage(station_ids, start_year, end_year, load_coverage_index())
+    print(f"Returning coverage for {len(coverage)} stations between {start_year} and {end_year}.")
+    return jsonify(coverage)
+
+# Response encodings for /get_weather_data. Each one serializes the frame a
+# slice at a time so large stations stream instead of building one string.
+def frame_slices(weather_data):
+    for start in range(0, len(weather_data), RESPONSE_CHUNK_ROWS):
+        yield weather_data.iloc[start:start + RESPONSE_CHUNK_ROWS]
+
+def iso_dates(dates):
+    return np.datetime_as_string(dates.to_numpy().astype("datetime64[D]"))
+
+def encode_records(weather_data):
+    # The original layout: one object per row, DATE in epoch milliseconds.
+    yield "["
+    for number, chunk in enumerate(frame_slices(weather_data)):
+        millis = chunk["DATE"].to_numpy().astype("datetime64[ms]").astype(np.int64)
+        yield ("," if number else "") + chunk.assign(DATE=millis).to_json(orient="records")[1:-1]
+    yield "]"
+
+def encode_columns(weather_data):
+    columns = {
+        "DATE": lambda chunk: iso_dates(chunk["DATE"]).tolist(),
+        "ELEMENT": lambda chunk: chunk["ELEMENT"].astype(str).tolist(),
+        "VALUE": lambda chunk: chunk["VALUE"].tolist(),
+    }
+    yield "{"
+    for position, (name, values) in enumerate(columns.items()):
+        yield ("," if position else "") + json.dumps(name) + ":["
+        for number, chunk in enumerate(frame_slices(weather_data)):
+            yield ("," if number else "") + json.dumps(values(chunk))[1:-1]
+        yield "]"
+    yield "}"
+
+def encode_ndjson(weather_data):
+    for chunk in frame_slices(weather_data):
+        lines = chunk.assign(DATE=iso_dates(chunk["DATE"])).to_json(orient="records", lines=True)
+        yield lines if lines.endswith("\n") else lines + "\n"
+
+def encode_arrow(weather_data):
+    # One IPC stream; ELEMENT shares a single dictionary across all batches.
+    elements = pd.Categorical(weather_data["ELEMENT"].astype(str))
+    dictionary = pa.array(elements.categories.tolist(), type=pa.string())
+    schema = pa.schema([
+        ("DATE", pa.date32()),
+        ("ELEMENT", pa.dictionary(pa.int8(), pa.string())),
+        ("VALUE", pa.int32()),
+    ])
+    sink = io.BytesIO()
+    with pa.ipc.new_stream(sink, schema) as writer:
+        for start in range(0, len(weather_data), RESPONSE_CHUNK_ROWS):
+            chunk = weather_data.iloc[start:start + RESPONSE_CHUNK_ROWS]
+            codes = elements.codes[start:start + RESPONSE_CHUNK_ROWS].astype(np.int8)
+            writer.write_batch(pa.record_batch([
+                pa.array(chunk["DATE"].to_numpy().astype("datetime64[D]"), type=pa.date32()),
+                pa.DictionaryArray.from_arrays(pa.array(codes), dictionary),
+                pa.array(chunk["VALUE"].to_numpy().astype(np.int32)),
+            ], schema=schema))
+            yield sink.getvalue()
+            sink.seek(0)
+            sink.truncate()
+    yield sink.getvalue()
+
+WEATHER_FORMATS = {
+    "records": ("application/json", encode_records),
+    "columns": ("application/json", encode_columns),
+    "ndjson": ("application/x-ndjson", encode_ndjson),
+    "arrow": ("application/vnd.apache.arrow.stream", encode_arrow),
+}
+WEATHER_FORMAT_BY_MIMETYPE = {
+    "application/json": "records",
+    "application/x-ndjson": "ndjson",
+    "application/vnd.apache.arrow.stream": "arrow",
+}
+
+def negotiate_weather_format():
+    name = request.args.get("format")
+    if name is None:
+        best = request.accept_mimetypes.best_match(list(WEATHER_FORMAT_BY_MIMETYPE), default="application/json")
+        name = WEATHER_FORMAT_BY_MIMETYPE[best]
+    return name
+
+def negotiate_content_encoding():
+    encodings = ["br", "gzip"] if brotli is not None else ["gzip"]
+    return request.accept_encodings.best_match(encodings + ["identity"], default="identity")
+
+def compress_stream(chunks, encoding):
+    if encoding == "br":
+        compressor = brotli.Compressor()
+        compress, finish = compressor.process, compressor.finish
+    else:
+        compressor = zlib.compressobj(6, zlib.DEFLATED, 31)
+        compress, finish = compressor.compress, compressor.flush
+    for chunk in chunks:
+        compressed = compress(chunk.encode("utf-8") if isinstance(chunk, str) else chunk)
+        if compressed:
+            yield compressed
+    yield finish()
+
+def timed_chunks(chunks, stage, source):
+    # Times the encoder between chunks, not the client reading them.
+    elapsed = 0.0
+    chunks = iter(chunks)
+    while True:
+        start = time.perf_counter()
+        chunk = next(chunks, None)
+        elapsed += time.perf_counter() - start
+        if chunk is None:
+            break
+        yield chunk
+    record_stage(stage, elapsed, source)
+
+def weather_data_response(weather_data, format_name):
+    mimetype, encode = WEATHER_FORMATS[format_name]
+    chunks = timed_chunks(encode(weather_data), "serialize", format_name)
+    encoding = negotiate_content_encoding()
+    headers = {"Vary": "Accept, Accept-Encoding"}
+    if encoding != "identity":
+        chunks = compress_stream(chunks, encoding)
+        headers["Content-Encoding"] = encoding
+    return Response(chunks, mimetype=mimetype, headers=headers)
 
 @app.route('/get_weather_data', methods=['GET'])
 def get_weather_data():
@@ -212,28 +2005,243 @@ def get_weather_data():
     if not station_id:
         print("No station ID provided in get_weather_data request.")
         return jsonify({"error": "No station ID provided"}), 400
+    format_name = negotiate_weather_format()
+    if format_name not in WEATHER_FORMATS:
+        return jsonify({"error": f"Unknown format {format_name}"}), 400
+    if format_name == "arrow" and pa is None:
+        return jsonify({"error": "Arrow responses require pyarrow, which is not installed"}), 406
 
-    weather_data = fetch_weather_data(station_id)
-    if weather_data is None or weather_data.empty:
+    filters = {}
+    if start_year and end_year:
+        try:
+            filters["start_year"] = int(start_year)
+            filters["end_year"] = int(end_year)
+        except ValueError as e:
+            print("Error filtering weather data by year:", e)
+            return jsonify({"error": "Invalid year parameters"}), 400
+    if request.args.get('elements'):
+        filters["elements"] = request.args['elements'].split(',')
+        # Only the temperature elements are downloaded and cached.
+        unknown = [element for element in filters["elements"] if element not in TEMPERATURE_ELEMENTS]
+        if unknown:
+            return jsonify({"error": f"Unsupported elements {','.join(unknown)}; available: {','.join(TEMPERATURE_ELEMENTS)}"}), 400
+
+    try:
+        weather_data = fetch_weather_data_bounded(station_id, **filters)
+    except FuturesTimeoutError:
+        print(f"Timed out fetching weather data for station {station_id}.")
+        return jsonify({"error": f"Timed out fetching data for station {station_id}"}), 504
+    # An empty frame only means "no data" when nothing narrowed it down.
+    if weather_data is None or (weather_data.empty and not filters):
         print(f"No weather data found for station {station_id}.")
         return jsonify({"error": f"No data found for station {station_id}"}), 404
 
-    min_date = weather_data["DATE"].min()
-    max_date = weather_data["DATE"].max()
-    print(f"Weather data available for station {station_id} from {min_date} to {max_date}.")
+    # The validator covers the stored rows' version (or, for frames without one,
+    # the rows themselves) plus everything that shapes their encoding, so it is
+    # strong per representation.
+    rows = weather_data.attrs.get("version")
+    if rows is None:
+        rows = pd.util.hash_pandas_object(weather_data, index=False).to_numpy().tobytes()
+    etag = body_etag([station_id, filters, format_name, negotiate_content_encoding()], rows)
+    print(f"Returning {len(weather_data)} weather records for station {station_id} ({filters or 'all years'}).")
+    return conditional_response(etag, lambda: weather_data_response(weather_data, format_name), vary="Accept, Accept-Encoding")
 
-    if start_year and end_year:
+def station_latitudes(station_ids):
+    stations_df = cached_stations
+    if stations_df is None:
+        return dict.fromkeys(station_ids)
+    index = get_station_index(stations_df)
+    positions = index.locate(station_ids)
+    latitudes = index.stations['LATITUDE'].to_numpy()
+    return {
+        station_id: round(float(latitudes[position]), 4) if position >= 0 else None
+        for station_id, position in zip(station_ids, positions)
+    }
+
+def station_latitude(station_id):
+    return station_latitudes([station_id])[station_id]
+
+def aggregate_weather_data(weather_data, latitude_positive=True, end_year=None):
+    # Server-side equivalent of processWeatherData in static/js/script.js:
+    # annual and hemisphere-aware seasonal TMIN/TMAX means in degrees Celsius.
+    data = weather_data[weather_data["ELEMENT"].isin(TEMPERATURE_ELEMENTS) & weather_data["DATE"].notna()]
+    years = data["DATE"].dt.year.to_numpy(dtype=np.int64)
+    months = data["DATE"].dt.month.to_numpy(dtype=np.int64)
+    celsius = data["VALUE"].to_numpy(dtype=np.float64) / 10
+    elements = data["ELEMENT"].to_numpy()
+    season_years = years + ((months == 12) & latitude_positive)
+    seasons = MONTH_SEASON[months]
+    season_names = NORTHERN_SEASONS if latitude_positive else SOUTHERN_SEASONS
+
+    frame = pd.DataFrame({
+        "ELEMENT": elements, "YEAR": years, "SEASON_YEAR": season_years, "SEASON": seasons, "VALUE": celsius,
+    })
+    annual = frame.groupby(["ELEMENT", "YEAR"], sort=True)["VALUE"].mean()
+    seasonal = frame.groupby(["ELEMENT", "SEASON_YEAR", "SEASON"], sort=True)["VALUE"].mean()
+
+    summary = {}
+    for element, key in (("TMIN", "Tmin"), ("TMAX", "Tmax")):
+        element_annual = annual.xs(element, level="ELEMENT") if element in annual.index else annual.iloc[:0]
+        element_seasonal = seasonal.xs(element, level="ELEMENT") if element in seasonal.index else seasonal.iloc[:0]
+        summary[f"annual{key}"] = [
+            {"year": int(year), "value": float(value)} for year, value in element_annual.items()
+        ]
+        summary[f"seasonal{key}"] = [
+            {"season": season_names[season], "year": int(year), "value": float(value)}
+            for (year, season), value in element_seasonal.items()
+            if not (end_year is not None and season_names[season] == "Winter" and year > end_year)
+        ]
+    return summary
+
+@app.route('/get_weather_summary', methods=['GET'])
+def get_weather_summary():
+    station_id = request.args.get('station_id')
+    if not station_id:
+        print("No station ID provided in get_weather_summary request.")
+        return jsonify({"error": "No station ID provided"}), 400
+    try:
+        start_year = int(request.args['start_year']) if request.args.get('start_year') else None
+        end_year = int(request.args['end_year']) if request.args.get('end_year') else None
+        latitude = float(request.args['latitude']) if request.args.get('latitude') else station_latitude(station_id)
+    except ValueError as e:
+        print("Invalid parameters for get_weather_summary request:", e)
+        return jsonify({"error": "Invalid parameters"}), 400
+
+    summary = lookup_climatology_summary(station_id, latitude is None or latitude >= 0, start_year, end_year)
+    if summary is not None:
+        print(f"Weather summary for station {station_id} served from its climatology table.")
+        return jsonify(summary)
+
+    filters = {"start_year": start_year, "end_year": end_year} if start_year is not None and end_year is not None else {}
+    try:
+        weather_data = fetch_weather_data_bounded(station_id, **filters)
+    except FuturesTimeoutError:
+        print(f"Timed out fetching weather data for station {station_id}.")
+        return jsonify({"error": f"Timed out fetching data for station {station_id}"}), 504
+    if weather_data is None or (weather_data.empty and not filters):
+        print(f"No weather data found for station {station_id}.")
+        return jsonify({"error": f"No data found for station {station_id}"}), 404
+
+    return jsonify(aggregate_weather_data(weather_data, latitude is None or latitude >= 0, end_year))
+
+# Aggregation is pandas-heavy and holds the GIL, so multi-station summaries
+# spread it over worker processes; spawned lazily and with "spawn" because the
+# request threads and the upstream pool make forking this process unsafe.
+aggregate_executor = None
+aggregate_executor_lock = threading.Lock()
+
+def get_aggregate_executor():
+    global aggregate_executor
+    if AGGREGATE_PROCESSES < 1:
+        return None
+    with aggregate_executor_lock:
+        if aggregate_executor is None:
+            aggregate_executor = ProcessPoolExecutor(
+                max_workers=AGGREGATE_PROCESSES, mp_context=multiprocessing.get_context("spawn")
+            )
+        return aggregate_executor
+
+def reset_aggregate_executor(broken):
+    global aggregate_executor
+    with aggregate_executor_lock:
+        if aggregate_executor is broken:
+            aggregate_executor = None
+    broken.shutdown(wait=False, cancel_futures=True)
+
+def aggregate_in_pool(weather_data, latitude_positive, end_year):
+    executor = get_aggregate_executor()
+    if executor is not None:
         try:
-            start_year_int = int(start_year)
-            end_year_int = int(end_year)
-            filtered_data = weather_data[weather_data["DATE"].dt.year.between(start_year_int, end_year_int)]
-            print(f"Filtered weather data for station {station_id} between {start_year_int} and {end_year_int}: {len(filtered_data)} records found.")
-            weather_data = filtered_data
-        except Exception as e:
-            print("Error filtering weather data by year:", e)
-            return jsonify({"error": "Invalid year parameters"}), 400
+            return executor.submit(aggregate_weather_data, weather_data, latitude_positive, end_year)
+        except BrokenProcessPool as e:
+            print("Aggregation pool is broken, aggregating in-process:", e)
+            reset_aggregate_executor(executor)
+    future = Future()
+    future.set_result(aggregate_weather_data(weather_data, latitude_positive, end_year))
+    return future
+
+def configure_worker(workers):
+    # Run in every gunicorn worker after the fork. The master's pooled session
+    # holds sockets that must not be shared between processes, so each worker
+    # opens its own. Each worker also keeps its own weather cache and spawns its
+    # own aggregation pool, so unless they are set explicitly the cache budget
+    # and the cores are split across the workers instead of every worker taking
+    # all of them.
+    global AGGREGATE_PROCESSES, http_session
+    http_session = create_http_session()
+    if "GHCN_WEATHER_CACHE_BYTES" not in os.environ:
+        weather_cache.max_bytes = WEATHER_CACHE_BYTES // workers
+    if "GHCN_AGGREGATE_PROCESSES" not in os.environ:
+        AGGREGATE_PROCESSES = max(1, available_cpus() // workers)
+
+def summarize_stations(station_ids, start_year=None, end_year=None, timeout=None):
+    # Stations with a current climatology table are answered from it, and
+    # mirrored or freshly cached ones are aggregated right away. The rest
+    # download concurrently on the upstream threads; each is handed to the
+    # aggregation processes as soon as its data arrives.
+    timeout = UPSTREAM_TIMEOUT_SECONDS if timeout is None else timeout
+    latitudes = station_latitudes(station_ids)
+    filters = {"start_year": start_year, "end_year": end_year} if start_year is not None and end_year is not None else {}
+    results = {station_id: {"error": f"Timed out fetching data for station {station_id}"} for station_id in station_ids}
+    aggregations = {}
 
-    return weather_data.to_json(orient='records')
+    def aggregate(station_id, weather_data):
+        if weather_data is None or (weather_data.empty and not filters):
+            results[station_id] = {"error": f"No data found for station {station_id}"}
+            return
+        latitude = latitudes[station_id]
+        aggregations[station_id] = aggregate_in_pool(weather_data, latitude is None or latitude >= 0, end_year)
+
+    downloads = {}
+    for station_id in station_ids:
+        latitude = latitudes[station_id]
+        summary = lookup_climatology_summary(station_id, latitude is None or latitude >= 0, start_year, end_year)
+        if summary is not None:
+            results[station_id] = summary
+            continue
+        weather_data = fetch_local_weather_data(station_id, **filters)
+        if weather_data is not None:
+            aggregate(station_id, weather_data)
+        else:
+            downloads[submit_upstream(fetch_remote_weather_data, station_id, **filters)] = station_id
+    try:
+        for download in as_completed(downloads, timeout=timeout):
+            station_id = downloads[download]
+            try:
+                weather_data = download.result()
+            except Exception as e:
+                print(f"Fetching weather data for station {station_id} failed:", e)
+                results[station_id] = {"error": f"Failed to fetch data for station {station_id}"}
+                continue
+            aggregate(station_id, weather_data)
+    except FuturesTimeoutError:
+        print(f"Timed out fetching weather data for {sum(not download.done() for download in downloads)} of {len(downloads)} stations.")
+    for station_id, aggregation in aggregations.items():
+        try:
+            results[station_id] = aggregation.result()
+        except BrokenProcessPool as e:
+            print(f"Aggregation of station {station_id} lost its worker process:", e)
+            results[station_id] = {"error": f"Failed to aggregate data for station {station_id}"}
+    return [dict(ID=station_id, latitude=latitudes[station_id], **results[station_id]) for station_id in station_ids]
+
+@app.route('/get_weather_summaries', methods=['GET'])
+def get_weather_summaries():
+    station_ids = [station_id for station_id in request.args.get('station_ids', '').split(',') if station_id]
+    if not station_ids:
+        print("No station IDs provided in get_weather_summaries request.")
+        return jsonify({"error": "No station IDs provided"}), 400
+    if len(station_ids) > MAX_SUMMARY_STATIONS:
+        return jsonify({"error": f"At most {MAX_SUMMARY_STATIONS} station IDs per request"}), 400
+    try:
+        start_year = int(request.args['start_year']) if request.args.get('start_year') else None
+        end_year = int(request.args['end_year']) if request.args.get('end_year') else None
+    except ValueError as e:
+        print("Invalid parameters for get_weather_summaries request:", e)
+        return jsonify({"error": "Invalid parameters"}), 400
+
+    summaries = summarize_stations(list(dict.fromkeys(station_ids)), start_year, end_year)
+    print(f"Returning weather summaries for {len(summaries)} stations.")
+    return jsonify(summaries)
 
 @app.errorhandler(Exception)
 def handle_global_error(error):
@@ -250,16 +2258,20 @@ preload_started = False
 
 @app.before_request
 def start_background_preload_once():
-    global preload_started, preloading_complete
+    global preload_started, preloading_complete, preload_running
     if not preload_started:
         preload_started = True
+        preload_running = True
         def background_load():
-            global preloading_complete
+            global preloading_complete, preload_running
             print("Preloading station and inventory data...")
-            load_stations()
-            load_inventory()
+            try:
+                load_stations()
+            finally:
+                preload_running = False
             preloading_complete = True
             print("Preloading complete.")
+            refresh_catalog_periodically()
         threading.Thread(target=background_load, daemon=True).start()
 
 if __name__ == "__main__":
@@ -267,7 +2279,6 @@ if __name__ == "__main__":
         global preloading_complete
         print("Preloading station and inventory data...")
         load_stations()
-        load_inventory()
         preloading_complete = True
         print("Preloading complete.")
 
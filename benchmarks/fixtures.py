@@ -0,0 +1,80 @@
+# Synthetic GHCN-Daily files in the upstream fixed-width and CSV layouts,
+# sized like the real ones by default. Everything is seeded, so two runs
+# benchmark byte-identical inputs.
+import numpy as np
+
+FULL_STATIONS = 130000
+INVENTORY_ELEMENTS = ["PRCP", "SNOW", "SNWD", "TMAX", "TMIN", "TAVG", "TOBS", "WT01", "WT03", "AWND"]
+WEATHER_ELEMENTS = ["TMAX", "TMIN", "PRCP"]
+
+
+def station_ids(count, seed=0):
+    rng = np.random.default_rng(seed)
+    networks = rng.choice(["USC00", "USW00", "GME00", "ASN00", "CA00"], count)
+    return [f"{network}{number:0{11 - len(network)}d}" for network, number in zip(networks, range(count))]
+
+
+def station_coordinates(count, seed=0):
+    rng = np.random.default_rng(seed + 1)
+    # Uniform on the sphere, so the grid sees dense and sparse regions alike.
+    latitudes = np.degrees(np.arcsin(rng.uniform(-1, 1, count)))
+    longitudes = rng.uniform(-180, 180, count)
+    return latitudes, longitudes
+
+
+def stations_text(count=FULL_STATIONS, seed=0):
+    ids = station_ids(count, seed)
+    latitudes, longitudes = station_coordinates(count, seed)
+    elevations = np.random.default_rng(seed + 2).uniform(-10, 4000, count)
+    return "".join(
+        f"{station_id:11} {latitude:8.4f} {longitude:9.4f} {elevation:6.1f} {'NY' if number % 4 == 0 else '  '} "
+        f"{f'STATION {number}':30} GSN     {number % 100000:5d}\n"
+        for number, (station_id, latitude, longitude, elevation)
+        in enumerate(zip(ids, latitudes, longitudes, elevations))
+    )
+
+
+def inventory_text(count=FULL_STATIONS, seed=0):
+    # About six elements per station, which gives the real file's ~780k lines.
+    ids = station_ids(count, seed)
+    latitudes, longitudes = station_coordinates(count, seed)
+    rng = np.random.default_rng(seed + 3)
+    element_counts = rng.integers(2, len(INVENTORY_ELEMENTS) + 1, count)
+    lines = []
+    for station_id, latitude, longitude, element_count in zip(ids, latitudes, longitudes, element_counts):
+        for element in INVENTORY_ELEMENTS[:element_count]:
+            first_year = int(rng.integers(1850, 2015))
+            last_year = int(rng.integers(first_year, 2025))
+            lines.append(f"{station_id:11} {latitude:8.4f} {longitude:9.4f} {element} {first_year} {last_year}\n")
+    return "".join(lines)
+
+
+def daily_values(first_year, last_year, seed=0):
+    days = np.arange(np.datetime64(f"{first_year}-01-01"), np.datetime64(f"{last_year + 1}-01-01"))
+    rng = np.random.default_rng(seed + 4)
+    values = {element: rng.integers(-300, 400, len(days)) for element in WEATHER_ELEMENTS}
+    return days, values
+
+
+def weather_csv_text(station_id="USW00094728", first_year=1869, last_year=2024, seed=0):
+    days, values = daily_values(first_year, last_year, seed)
+    dates = np.datetime_as_string(days).astype("U10")
+    compact = np.char.replace(dates, "-", "")
+    return "".join(
+        f"{station_id},{date},{element},{value},,,7,0700\n"
+        for date, row in zip(compact, zip(*(values[element] for element in WEATHER_ELEMENTS)))
+        for element, value in zip(WEATHER_ELEMENTS, row)
+    )
+
+
+def weather_dly_text(station_id="USW00094728", first_year=1869, last_year=2024, seed=0):
+    days, values = daily_values(first_year, last_year, seed)
+    months = days.astype("datetime64[M]")
+    lines = []
+    for month in np.unique(months):
+        in_month = months == month
+        year, month_number = str(month)[:4], str(month)[5:7]
+        for element in WEATHER_ELEMENTS:
+            month_values = list(values[element][in_month]) + [-9999] * (31 - int(in_month.sum()))
+            lines.append(f"{station_id}{year}{month_number}{element}" + "".join(f"{value:5d}   " for value in month_values) + "\n")
+    return "".join(lines)
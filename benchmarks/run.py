@@ -0,0 +1,251 @@
+# Times the data pipeline and the JSON endpoints against synthetic fixtures.
+#
+#   python benchmarks/run.py                          full-size run, prints a table
+#   python benchmarks/run.py --save baseline.json     also store the results
+#   python benchmarks/run.py --baseline baseline.json --max-regression 1.25
+#                                                     exit 1 if any case's p50 got
+#                                                     more than 25 % slower
+#
+# NOAA is never contacted: app.http_get is pointed at the in-memory fixtures.
+import argparse
+import contextlib
+import json
+import os
+import shutil
+import sys
+import tempfile
+import time
+import tracemalloc
+
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+import app  # noqa: E402
+import fixtures  # noqa: E402
+
+
+class FixtureResponse:
+    def __init__(self, status_code, content=b""):
+        self.status_code = status_code
+        self.content = content
+        self.headers = {"ETag": '"fixture"'} if status_code == 200 else {}
+
+    @property
+    def text(self):
+        return self.content.decode("utf-8")
+
+    def iter_content(self, chunk_size=1, decode_unicode=False):
+        for start in range(0, len(self.content), chunk_size):
+            yield self.content[start:start + chunk_size]
+
+    def close(self):
+        pass
+
+
+def build_fixtures(scale, seed):
+    station_count = max(100, int(fixtures.FULL_STATIONS * scale))
+    first_year = 2024 - max(5, int(155 * min(scale * 10, 1)))
+    files = {
+        "ghcnd-stations.txt": fixtures.stations_text(station_count, seed),
+        "ghcnd-inventory.txt": fixtures.inventory_text(station_count, seed),
+        "USW00094728.csv": fixtures.weather_csv_text("USW00094728", first_year, 2024, seed),
+        "USW00094728.dly": fixtures.weather_dly_text("USW00094728", first_year, 2024, seed),
+    }
+    return {name: text.encode("utf-8") for name, text in files.items()}
+
+
+def serve_fixtures(files):
+    def http_get(url, headers=None, stream=False):
+        body = files.get(url.rsplit("/", 1)[-1])
+        return FixtureResponse(200, body) if body is not None else FixtureResponse(404)
+    app.http_get = http_get
+
+
+def reset_catalog():
+    app.cached_stations = app.cached_inventory = app.station_index = None
+    app.retired_stations = None
+
+
+def reset_cache(cache_dir):
+    shutil.rmtree(cache_dir, ignore_errors=True)
+    reset_catalog()
+    app.weather_cache.clear()
+
+
+def measure(fn, setup, repeat):
+    # One untimed warm-up, `repeat` timed runs, then one run under tracemalloc
+    # for the peak, kept separate because tracing slows allocation-heavy code.
+    setup()
+    fn()
+    timings = []
+    for _ in range(repeat):
+        setup()
+        start = time.perf_counter()
+        fn()
+        timings.append(time.perf_counter() - start)
+    setup()
+    tracemalloc.start()
+    fn()
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    return np.array(timings), peak
+
+
+def run_cases(files, repeat, seed, cache_dir):
+    client = app.app.test_client()
+    rng = np.random.default_rng(seed)
+    latitudes, longitudes = fixtures.station_coordinates(32, seed + 100)
+    points = list(zip(latitudes, longitudes))
+    csv_text = files["USW00094728.csv"].decode("utf-8")
+    dly_text = files["USW00094728.dly"].decode("utf-8")
+    catalog_bytes = len(files["ghcnd-stations.txt"]) + len(files["ghcnd-inventory.txt"])
+
+    def nothing():
+        pass
+
+    def cold():
+        reset_cache(cache_dir)
+
+    def warm_catalog():
+        reset_catalog()
+        app.load_stations()
+        reset_catalog()
+
+    def loaded_catalog():
+        if app.cached_stations is None:
+            app.load_stations()
+
+    def cold_weather():
+        app.weather_cache.clear()
+        shutil.rmtree(os.path.join(cache_dir, "weather"), ignore_errors=True)
+
+    def warm_weather():
+        loaded_catalog()
+        app.fetch_weather_data("USW00094728")
+
+    def query_points(fn):
+        def run():
+            for latitude, longitude in points:
+                fn(latitude, longitude)
+        return run
+
+    def get_stations(latitude, longitude):
+        response = client.get(
+            f"/get_stations?latitude={latitude}&longitude={longitude}&radius_km=500"
+            f"&station_count=10&start_year=1990&end_year=2000"
+        )
+        assert response.status_code == 200, response.status_code
+
+    def get_weather_data():
+        start = int(rng.integers(1950, 2010))
+        response = client.get(f"/get_weather_data?station_id=USW00094728&start_year={start}&end_year={start + 10}")
+        assert response.status_code == 200, response.status_code
+        response.get_data()
+
+    def cold_weather_data():
+        loaded_catalog()
+        cold_weather()
+
+    def filter_stations(latitude, longitude):
+        app.fetch_and_filter_stations(latitude, longitude, 100)
+
+    stations_text = files["ghcnd-stations.txt"].decode("utf-8")
+    inventory_text = files["ghcnd-inventory.txt"].decode("utf-8")
+    # name: (function, setup, units per run, unit)
+    return {
+        "parse_stations": (lambda: app.parse_stations_from_string(stations_text), nothing, len(stations_text), "B"),
+        "parse_inventory": (lambda: app.parse_inventory_from_string(inventory_text), nothing, len(inventory_text), "B"),
+        "load_stations_cold": (app.load_stations, cold, catalog_bytes, "B"),
+        "load_stations_warm": (app.load_stations, warm_catalog, 1, "load"),
+        "load_inventory_cold": (app.load_inventory, cold, len(inventory_text), "B"),
+        "fetch_and_filter_stations": (query_points(filter_stations), loaded_catalog, len(points), "query"),
+        "parse_ghcnd_csv": (lambda: app.parse_ghcnd_csv_from_string(csv_text), nothing, len(csv_text), "B"),
+        "parse_ghcnd_dly": (lambda: app.parse_ghcnd_dly_from_string(dly_text), nothing, len(dly_text), "B"),
+        "get_stations": (query_points(get_stations), loaded_catalog, len(points), "request"),
+        "get_weather_data_cold": (get_weather_data, cold_weather_data, 1, "request"),
+        "get_weather_data_warm": (get_weather_data, warm_weather, 1, "request"),
+    }
+
+
+def format_rate(rate, unit):
+    if unit == "B":
+        return f"{rate / 1e6:10.1f} MB/s"
+    return f"{rate:10.1f} {unit}/s"
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark the GHCN data pipeline and endpoints.")
+    parser.add_argument("--scale", type=float, default=1.0, help="fraction of the full-size fixtures (default 1.0)")
+    parser.add_argument("--repeat", type=int, default=5, help="timed runs per case (default 5)")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--only", nargs="*", help="run only these cases")
+    parser.add_argument("--verbose", action="store_true", help="show the app's own log output")
+    parser.add_argument("--save", help="write the results as JSON to this path")
+    parser.add_argument("--baseline", help="compare p50 latencies against a results file written by --save")
+    parser.add_argument("--max-regression", type=float, default=1.25,
+                        help="allowed p50 ratio against the baseline before failing (default 1.25)")
+    args = parser.parse_args(argv)
+
+    files = build_fixtures(args.scale, args.seed)
+    cache_dir = tempfile.mkdtemp(prefix="ghcn-bench-")
+    # Everything patched here is put back afterwards, so the suite can also be
+    # driven from an already running interpreter (e.g. the test suite).
+    patched = ("http_get", "CACHE_DIR", "preload_started", "AGGREGATE_PROCESSES",
+               "cached_stations", "cached_inventory", "station_index", "retired_stations")
+    saved = {name: getattr(app, name) for name in patched}
+    serve_fixtures(files)
+    app.CACHE_DIR = cache_dir
+    # Keep the first test-client request from starting the background preload.
+    app.preload_started = True
+    app.AGGREGATE_PROCESSES = 0
+
+    results = {}
+    try:
+        cases = run_cases(files, args.repeat, args.seed, cache_dir)
+        print(f"{'case':28} {'p50 ms':>10} {'p99 ms':>10} {'throughput':>16} {'peak MB':>10}")
+        for name, (fn, setup, units, unit) in cases.items():
+            if args.only and name not in args.only:
+                continue
+            with open(os.devnull, "w") as devnull, contextlib.redirect_stdout(sys.stdout if args.verbose else devnull):
+                timings, peak = measure(fn, setup, args.repeat)
+            p50, p99 = np.percentile(timings, [50, 99])
+            rate = units / p50 if p50 > 0 else float("inf")
+            results[name] = {"p50": p50, "p99": p99, "throughput": rate, "unit": unit, "peak_bytes": peak}
+            print(f"{name:28} {p50 * 1000:10.2f} {p99 * 1000:10.2f} {format_rate(rate, unit):>16} {peak / 1e6:10.1f}")
+    finally:
+        shutil.rmtree(cache_dir, ignore_errors=True)
+        for name, value in saved.items():
+            setattr(app, name, value)
+        app.weather_cache.clear()
+
+    if args.save:
+        with open(args.save, "w") as f:
+            json.dump({"scale": args.scale, "repeat": args.repeat, "results": results}, f, indent=2)
+
+    if args.baseline:
+        with open(args.baseline) as f:
+            baseline = json.load(f)
+        if baseline.get("scale") != args.scale:
+            print(f"Baseline was recorded at scale {baseline.get('scale')}, this run used {args.scale}.")
+            return 2
+        regressions = []
+        for name, result in results.items():
+            before = baseline["results"].get(name)
+            if before is None:
+                continue
+            ratio = result["p50"] / before["p50"]
+            if ratio > args.max_regression:
+                regressions.append(f"{name}: p50 {before['p50'] * 1000:.2f} ms -> {result['p50'] * 1000:.2f} ms ({ratio:.2f}x)")
+        if regressions:
+            print("Performance regressions against the baseline:")
+            for regression in regressions:
+                print("  " + regression)
+            return 1
+        print(f"No case regressed by more than {args.max_regression:.2f}x against the baseline.")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,26 @@
+import os
+
+from app import available_cpus
+
+bind = f"0.0.0.0:{os.environ.get('PORT', '8080')}"
+workers = int(os.environ.get("WEB_CONCURRENCY", available_cpus()))
+# Threaded workers keep answering /get_stations and /preload_status while
+# other threads wait on NOAA downloads, which run on app.upstream_executor.
+worker_class = "gthread"
+threads = int(os.environ.get("GUNICORN_THREADS", 32))
+timeout = int(os.environ.get("GUNICORN_TIMEOUT", 120))
+
+
+def on_starting(server):
+    # Build the station catalog once in the master. Workers map the published
+    # snapshot read-only instead of each downloading and parsing it again.
+    import app
+
+    if not app.build_catalog_snapshot():
+        server.log.warning("Catalog snapshot could not be built; workers will load the catalog themselves.")
+
+
+def post_fork(server, worker):
+    import app
+
+    app.configure_worker(server.cfg.workers)
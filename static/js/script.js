@@ -156,25 +156,30 @@ function toggleDropdown(event) {
 }
 
 async function filterStationsByWeatherData(stations, startYear, endYear) {
-  let filteredStations = [];
-  await Promise.all(stations.map(async (station) => {
-    try {
-      const response = await fetch(`/get_weather_data?station_id=${encodeURIComponent(station.ID)}&start_year=${encodeURIComponent(startYear)}&end_year=${encodeURIComponent(endYear)}`);
-      if (!response.ok) {
-        console.warn(`Weather data not available for station ${station.ID}`);
-        return;
-      }
-      const data = await response.json();
-      const hasTmin = data.some(record => record.ELEMENT === "TMIN");
-      const hasTmax = data.some(record => record.ELEMENT === "TMAX");
-      if (hasTmin || hasTmax) {
-        filteredStations.push(station);
-      }
-    } catch (error) {
-      console.error(`Error checking weather data for station ${station.ID}:`, error);
+  if (stations.length === 0) {
+    return [];
+  }
+  try {
+    const response = await fetch("/get_station_coverage", {
+      method: "POST",
+      headers: { "Content-Type": "application/json" },
+      body: JSON.stringify({
+        station_ids: stations.map(station => station.ID),
+        start_year: startYear,
+        end_year: endYear
+      })
+    });
+    if (!response.ok) {
+      console.warn("Station coverage not available");
+      return [];
     }
-  }));
-  return filteredStations;
+    const coverage = await response.json();
+    const coveredIds = new Set(coverage.filter(entry => entry.covered).map(entry => entry.ID));
+    return stations.filter(station => coveredIds.has(station.ID));
+  } catch (error) {
+    console.error("Error checking station coverage:", error);
+    return [];
+  }
 }
 
 async function fetchStationData() {
@@ -197,7 +202,7 @@ async function fetchStationData() {
   }
 
   
-  let queryParams = `?latitude=${encodeURIComponent(latitude)}&longitude=${encodeURIComponent(longitude)}&radius_km=${encodeURIComponent(radiusKm)}&station_count=9999&start_year=${encodeURIComponent(startYear)}&end_year=${encodeURIComponent(endYear)}`;
+  let queryParams = `?latitude=${encodeURIComponent(latitude)}&longitude=${encodeURIComponent(longitude)}&radius_km=${encodeURIComponent(radiusKm)}&station_count=${encodeURIComponent(stationCount)}&start_year=${encodeURIComponent(startYear)}&end_year=${encodeURIComponent(endYear)}`;
   let fetchUrl = `/get_stations${queryParams}`;
   console.log("Fetching Stations from:", fetchUrl);
   
@@ -281,19 +286,21 @@ function selectStationByData(station) {
 
 async function fetchWeatherData(stationId, startYear, endYear) {
   try {
-    const response = await fetch(`/get_weather_data?station_id=${encodeURIComponent(stationId)}&start_year=${encodeURIComponent(startYear)}&end_year=${encodeURIComponent(endYear)}`);
+    const latitude = getInputValue("latitude");
+    const response = await fetch(`/get_weather_summary?station_id=${encodeURIComponent(stationId)}&start_year=${encodeURIComponent(startYear)}&end_year=${encodeURIComponent(endYear)}&latitude=${encodeURIComponent(latitude)}`);
     if (!response.ok) {
       let errorText = await response.text();
       throw new Error(`Server returned ${response.status}: ${errorText}`);
     }
     const data = await response.json();
-    console.log("Raw weather data:", data);
+    console.log("Weather summary:", data);
     if (data.error) {
       console.error("Error fetching weather data:", data.error);
       document.getElementById("d3-chart").innerHTML = `<p>Error: ${data.error}</p>`;
       return;
     }
-    processWeatherData(data);
+    window.currentWeatherDataset = data;
+    drawChart(data);
   } catch (error) {
     console.error("Failed to fetch weather data:", error);
   }
@@ -855,11 +862,21 @@ function checkPreloadStatus() {
   fetch('/preload_status')
     .then(response => response.json())
     .then(data => {
-        if (data.status === "done") {
+        const stages = data.stages || {};
+        const ready = ["catalog", "stations"].find(name => stages[name] && stages[name].state === "done");
+        if (ready) {
+            // Nearby stations can be searched as soon as the station list is in;
+            // the count is updated again once the inventory has filtered it.
             hideLoading();
-        } else {
-            
+            const count = document.getElementById("station-count");
+            if (count && stages[ready].rows !== null) {
+                count.textContent = stages[ready].rows;
+            }
+        }
+        if (data.status !== "done") {
             setTimeout(checkPreloadStatus, 1000);
+        } else {
+            hideLoading();
         }
     })
     .catch(error => {
@@ -1,6 +1,6 @@
 import pytest
-import requests
 import pandas as pd
+import numpy as np
 import sys
 from app import (
     haversine,
@@ -11,11 +11,38 @@ from app import (
     parse_ghcnd_dly_from_string,
     app,
     load_inventory,
+    select_weather_data,
 )
 
 BASE_URL = "http://127.0.0.1:5000"
 
 
+class MockResponse:
+    def __init__(self, status_code, text, headers=None):
+        self.status_code = status_code
+        self.text = text
+        self.content = text.encode("utf-8")
+        self.headers = headers or {}
+
+    def iter_content(self, chunk_size=1, decode_unicode=False):
+        for start in range(0, len(self.content), chunk_size):
+            yield self.content[start:start + chunk_size]
+
+    def close(self):
+        pass
+
+
+@pytest.fixture(autouse=True)
+def cache_dir(tmp_path, monkeypatch):
+    monkeypatch.setattr("app.CACHE_DIR", str(tmp_path / "cache"))
+    monkeypatch.setattr("app.MIRROR_DIR", str(tmp_path / "mirror"))
+    # Keep the background preload from racing the mocked loads against NOAA.
+    monkeypatch.setattr("app.preload_started", True)
+    sys.modules["app"].weather_cache.clear()
+    sys.modules["app"].stations_response_cache.clear()
+    return tmp_path / "cache"
+
+
 @pytest.fixture
 def client():
     with app.test_client() as client:
@@ -49,11 +76,8 @@ def test_load_inventory(monkeypatch):
         "\n"
     )
     def mock_requests_get(url, *args, **kwargs):
-        class MockResponse:
-            status_code = 200
-            text = mock_inventory
-        return MockResponse()
-    monkeypatch.setattr(requests, "get", mock_requests_get)
+        return MockResponse(200, mock_inventory)
+    monkeypatch.setattr("app.http_get", mock_requests_get)
     inventory_df = load_inventory()
     assert not inventory_df.empty
     assert "ID" in inventory_df.columns
@@ -72,11 +96,8 @@ def test_preload_status(client):
 
 def test_fetch_weather_data_fallback(monkeypatch):
     def mock_requests_get(url, *args, **kwargs):
-        class MockResponse:
-            status_code = 404
-            text = ""
-        return MockResponse()
-    monkeypatch.setattr(requests, "get", mock_requests_get)
+        return MockResponse(404, "")
+    monkeypatch.setattr("app.http_get", mock_requests_get)
 
     from app import fetch_weather_data
     weather_data = fetch_weather_data("USW00094728")
@@ -99,12 +120,9 @@ def test_load_stations(monkeypatch):
     mock_data = "USW00094728   40.783  -73.967  39.9 NY NEW YORK CITY CENTRAL PARK"
 
     def mock_requests_get(*args, **kwargs):
-        class MockResponse:
-            status_code = 200
-            text = mock_data
-        return MockResponse()
+        return MockResponse(200, mock_data)
 
-    monkeypatch.setattr(requests, "get", mock_requests_get)
+    monkeypatch.setattr("app.http_get", mock_requests_get)
 
     stations_df = load_stations()
     assert not stations_df.empty
@@ -116,12 +134,9 @@ def test_fetch_and_filter_stations(monkeypatch):
     mock_data = "USW00094728   40.783  -73.967  39.9 NY NEW YORK CITY CENTRAL PARK"
 
     def mock_requests_get(*args, **kwargs):
-        class MockResponse:
-            status_code = 200
-            text = mock_data
-        return MockResponse()
+        return MockResponse(200, mock_data)
 
-    monkeypatch.setattr(requests, "get", mock_requests_get)
+    monkeypatch.setattr("app.http_get", mock_requests_get)
 
     filtered_stations = fetch_and_filter_stations(40.7, -74.0, 50)  # New York, Radius 50 km
     assert not filtered_stations.empty
@@ -135,12 +150,9 @@ def test_fetch_weather_data(monkeypatch):
         USW00094728,20230102,TMIN,10,M,X,S,0700"""
 
     def mock_requests_get(*args, **kwargs):
-        class MockResponse:
-            status_code = 200
-            text = mock_data
-        return MockResponse()
+        return MockResponse(200, mock_data)
 
-    monkeypatch.setattr(requests, "get", mock_requests_get)
+    monkeypatch.setattr("app.http_get", mock_requests_get)
 
     weather_data = fetch_weather_data("USW00094728")
     assert weather_data is not None
@@ -172,18 +184,15 @@ def test_get_weather_data_missing_param(client):
 def test_get_weather_data_invalid_station(client, monkeypatch):
     def mock_fetch_weather_data(station_id):
         return None 
-    monkeypatch.setattr("app.fetch_weather_data", mock_fetch_weather_data)
+    monkeypatch.setattr("app.fetch_remote_weather_data", mock_fetch_weather_data)
     response = client.get(f"{BASE_URL}/get_weather_data?station_id=INVALID")
     assert response.status_code == 404
     assert "error" in response.json
 
 def test_fetch_weather_data_request_failed(monkeypatch):
     def mock_requests_get(*args, **kwargs):
-        class MockResponse:
-            status_code = 404
-            text = ""
-        return MockResponse()
-    monkeypatch.setattr(requests, "get", mock_requests_get)
+        return MockResponse(404, "")
+    monkeypatch.setattr("app.http_get", mock_requests_get)
     weather_data = fetch_weather_data("INVALID_ID")
     assert weather_data is None
 
@@ -251,22 +260,13 @@ def test_get_stations_endpoint(monkeypatch, client):
     
     def mock_requests_get(url, *args, **kwargs):
         if "ghcnd-stations.txt" in url:
-            class MockResponse:
-                status_code = 200
-                text = mock_station
-            return MockResponse()
+            return MockResponse(200, mock_station)
         elif "ghcnd-inventory.txt" in url:
-            class MockResponse:
-                status_code = 200
-                text = mock_inventory
-            return MockResponse()
+            return MockResponse(200, mock_inventory)
         else:
-            class MockResponse:
-                status_code = 404
-                text = ""
-            return MockResponse()
+            return MockResponse(404, "")
     
-    monkeypatch.setattr(requests, "get", mock_requests_get)
+    monkeypatch.setattr("app.http_get", mock_requests_get)
     
     response = client.get("/get_stations?latitude=40.783&longitude=-73.967&radius_km=10&station_count=10&start_year=1900&end_year=2020")
     assert response.status_code == 200
@@ -274,6 +274,19 @@ def test_get_stations_endpoint(monkeypatch, client):
     assert isinstance(stations, list)
     assert any(station["ID"] == "USW00094728" for station in stations)
 
+def test_get_stations_rejects_non_finite_or_negative_radius(client):
+    from app import StationIndex, parse_stations_from_string
+    url = "/get_stations?station_count=10&start_year=1900&end_year=2020"
+    for params in ("&latitude=40.7&longitude=-73.9&radius_km=nan", "&latitude=40.7&longitude=-73.9&radius_km=inf",
+                   "&latitude=40.7&longitude=-73.9&radius_km=-5", "&latitude=nan&longitude=-73.9&radius_km=10"):
+        assert client.get(url + params).status_code == 400
+
+    index = StationIndex(parse_stations_from_string("USW00094728  40.7789  -73.9692   39.6 NY NEW YORK CNTRL PK TWR\n"))
+    positions, _ = index.query_nearest(0.0, 0.0, 5, float("nan"))
+    assert len(positions) == 0
+    positions, _ = index.query_nearest(0.0, 0.0, 5, 1e9)
+    assert len(positions) == 1
+
 def test_parse_ghcnd_dly_from_string_valid():
     station_id = "USW00094728"         
     year = "2023"                      
@@ -303,12 +316,9 @@ def test_get_weather_data_endpoint_valid(monkeypatch, client):
     )
 
     def mock_requests_get(url, *args, **kwargs):
-        class MockResponse:
-            status_code = 200
-            text = mock_csv
-        return MockResponse()
+        return MockResponse(200, mock_csv)
 
-    monkeypatch.setattr(requests, "get", mock_requests_get)
+    monkeypatch.setattr("app.http_get", mock_requests_get)
     response = client.get(
         "/get_weather_data?station_id=USW00094728&start_year=2020&end_year=2021"
     )
@@ -336,21 +346,12 @@ def test_load_stations_inventory_failure(monkeypatch):
     )
     def mock_requests_get(url, *args, **kwargs):
         if "ghcnd-stations.txt" in url:
-            class MockResponse:
-                status_code = 200
-                text = mock_station
-            return MockResponse()
+            return MockResponse(200, mock_station)
         elif "ghcnd-inventory.txt" in url:
-            class MockResponse:
-                status_code = 404
-                text = ""
-            return MockResponse()
+            return MockResponse(404, "")
         else:
-            class MockResponse:
-                status_code = 404
-                text = ""
-            return MockResponse()
-    monkeypatch.setattr(requests, "get", mock_requests_get)
+            return MockResponse(404, "")
+    monkeypatch.setattr("app.http_get", mock_requests_get)
     app.cached_stations = None
     app.cached_inventory = None
     stations_df = load_stations()
@@ -373,22 +374,13 @@ def test_fetch_weather_data_dly_success(monkeypatch):
 
     def mock_requests_get(url, *args, **kwargs):
         if "by_station" in url:
-            class MockResponse:
-                status_code = 404
-                text = ""
-            return MockResponse()
+            return MockResponse(404, "")
         elif "all" in url:
-            class MockResponse:
-                status_code = 200
-                text = dly_line
-            return MockResponse()
+            return MockResponse(200, dly_line)
         else:
-            class MockResponse:
-                status_code = 404
-                text = ""
-            return MockResponse()
+            return MockResponse(404, "")
 
-    monkeypatch.setattr(requests, "get", mock_requests_get)
+    monkeypatch.setattr("app.http_get", mock_requests_get)
     df = fetch_weather_data(station_id)
     assert df is not None
     assert len(df) == 1
@@ -405,4 +397,1086 @@ def test_parse_ghcnd_csv_from_string_exception(monkeypatch):
         raise Exception("Test exception")
     monkeypatch.setattr(pd, "read_csv", mock_read_csv)
     df = parse_ghcnd_csv_from_string("invalid data")
-    assert df.empty
\ No newline at end of file
+    assert df.empty
+
+def test_fetch_and_filter_stations_sorted_without_mutating_cache(monkeypatch):
+    stations = pd.DataFrame({
+        "ID": ["FAR", "NEAR", "MID"],
+        "LATITUDE": [41.5, 40.71, 40.9],
+        "LONGITUDE": [-74.0, -74.0, -74.0],
+    })
+    monkeypatch.setattr("app.load_stations", lambda: stations)
+
+    filtered_stations = fetch_and_filter_stations(40.7, -74.0, 50)
+    assert list(filtered_stations["ID"]) == ["NEAR", "MID"]
+    assert filtered_stations["DISTANCE"].is_monotonic_increasing
+    assert round(filtered_stations.iloc[1]["DISTANCE"], 6) == round(haversine(40.7, -74.0, 40.9, -74.0), 6)
+    assert "DISTANCE" not in stations.columns
+
+
+def test_station_index_matches_full_scan_at_poles_and_antimeridian():
+    from app import StationIndex
+    rng = np.random.default_rng(42)
+    latitudes = np.concatenate([rng.uniform(-90, 90, 2000), rng.uniform(88, 90, 200), rng.uniform(-90, -88, 200)])
+    longitudes = np.concatenate([rng.uniform(-180, 180, 2000), rng.uniform(-180, 180, 400)])
+    stations = pd.DataFrame({"ID": [f"S{i}" for i in range(len(latitudes))], "LATITUDE": latitudes, "LONGITUDE": longitudes})
+    index = StationIndex(stations)
+    full_scan = np.array([haversine(lat, lon, 89.9, 179.9) for lat, lon in zip(latitudes, longitudes)])
+
+    for lat, lon, radius_km in [(89.9, 179.9, 300), (-89.5, 0.0, 500), (10.0, 179.99, 800), (10.0, -179.99, 800)]:
+        expected = np.array([haversine(lat, lon, a, b) for a, b in zip(latitudes, longitudes)])
+        positions, distances = index.query_radius(lat, lon, radius_km)
+        assert set(positions) == set(np.flatnonzero(expected <= radius_km))
+        assert np.allclose(distances, expected[positions])
+
+    positions, distances = index.query_nearest(89.9, 179.9, 5)
+    assert list(positions) == list(np.argsort(full_scan, kind="stable")[:5])
+
+
+def test_station_index_nearest_applies_predicate_and_radius():
+    from app import StationIndex
+    stations = pd.DataFrame({
+        "ID": ["A", "B", "C", "D"],
+        "LATITUDE": [0.0, 0.1, 0.2, 5.0],
+        "LONGITUDE": [0.0, 0.0, 0.0, 0.0],
+    })
+    index = StationIndex(stations)
+    positions, _ = index.query_nearest(0.0, 0.0, 2, predicate=lambda candidates: candidates != 0)
+    assert list(positions) == [1, 2]
+    positions, _ = index.query_nearest(0.0, 0.0, 10, radius_km=100)
+    assert list(positions) == [0, 1, 2]
+
+
+def test_station_index_temperature_coverage():
+    from app import StationIndex
+    stations = pd.DataFrame({"ID": ["A", "B", "C"], "LATITUDE": [0.0, 0.1, 0.2], "LONGITUDE": [0.0, 0.0, 0.0]})
+    inventory = pd.DataFrame({
+        "ID": ["A", "A", "B", "B", "C"],
+        "ELEMENT": ["TMIN", "TMAX", "TMIN", "TMAX", "TMIN"],
+        "FIRSTYEAR": [1900, 1950, 1980, 1970, 1900],
+        "LASTYEAR": [2020, 2010, 2024, 2024, 2024],
+    })
+    index = StationIndex(stations, inventory)
+    assert list(index.first_year) == [1950, 1980, np.iinfo(np.int16).max]
+    assert list(index.last_year) == [2010, 2024, np.iinfo(np.int16).min]
+    assert list(index.covers(np.arange(3), 1960, 2000)) == [True, False, False]
+    assert list(index.covers(np.arange(3), 1990, 2020)) == [False, True, False]
+
+
+def test_catalog_cache_warm_start_and_revalidation(monkeypatch):
+    from app import load_catalog_table, parse_inventory_from_string
+    mock_inventory = "USW00094728  40.7830  -73.9670 TMIN 1900 2020\nUSW00094728  40.7830  -73.9670 TMAX 1900 2020\n"
+    requested_headers = []
+
+    def mock_requests_get(url, *args, **kwargs):
+        requested_headers.append(kwargs.get("headers", {}))
+
+        return MockResponse(304 if requested_headers[-1] else 200, mock_inventory, {"ETag": '"v1"', "Last-Modified": "Mon, 01 Jan 2024 00:00:00 GMT"})
+
+    monkeypatch.setattr("app.http_get", mock_requests_get)
+    loaded = load_catalog_table("inventory", "ghcnd-inventory.txt", parse_inventory_from_string)
+    assert len(requested_headers) == 1
+
+    warm = load_catalog_table("inventory", "ghcnd-inventory.txt", parse_inventory_from_string)
+    assert len(requested_headers) == 1
+    pd.testing.assert_frame_equal(warm, loaded, check_dtype=False)
+
+    monkeypatch.setattr("app.CATALOG_MAX_AGE_SECONDS", 0)
+    revalidated = load_catalog_table("inventory", "ghcnd-inventory.txt", parse_inventory_from_string)
+    assert requested_headers[-1] == {"If-None-Match": '"v1"', "If-Modified-Since": "Mon, 01 Jan 2024 00:00:00 GMT"}
+    pd.testing.assert_frame_equal(revalidated, loaded, check_dtype=False)
+
+
+def test_catalog_snapshot_is_attached_read_only():
+    from app import StationIndex, publish_catalog_snapshot, attach_catalog_snapshot
+    stations = pd.DataFrame({"ID": ["A", "B", "C"], "LATITUDE": [0.0, 0.1, 0.2], "LONGITUDE": [0.0, 0.0, 0.0]})
+    inventory = pd.DataFrame({
+        "ID": ["A", "A", "B", "B", "C", "C"],
+        "ELEMENT": ["TMIN", "TMAX"] * 3,
+        "FIRSTYEAR": [1900, 1900, 1990, 1990, 1900, 1900],
+        "LASTYEAR": [2020, 2020, 2020, 2020, 2020, 2020],
+    })
+    index = StationIndex(stations, inventory)
+    publish_catalog_snapshot(index)
+
+    attached = attach_catalog_snapshot()
+    assert attached is not None
+    assert isinstance(attached.xyz, np.memmap)
+    assert list(attached.stations["ID"]) == ["A", "B", "C"]
+    positions, distances = attached.query_nearest(
+        0.05, 0.0, 2, 100, lambda candidates: attached.covers(candidates, 1950, 2000)
+    )
+    assert list(positions) == [0, 2]
+    assert np.allclose(distances, index.distances(0.05, 0.0, positions))
+
+
+def test_fetch_weather_data_cached_and_revalidated(monkeypatch):
+    app_module = sys.modules["app"]
+    mock_csv = "USW00094728,20230101,TMAX,30,,,S,\nUSW00094728,20230102,TMIN,10,,,S,\n"
+    requested_headers = []
+
+    def mock_requests_get(url, *args, **kwargs):
+        requested_headers.append(kwargs.get("headers", {}))
+
+        return MockResponse(304 if requested_headers[-1] else 200, mock_csv, {"ETag": '"abc"'})
+
+    monkeypatch.setattr("app.http_get", mock_requests_get)
+    first = fetch_weather_data("USW00094728")
+    assert fetch_weather_data("USW00094728") is first
+    assert len(requested_headers) == 1
+
+    app_module.weather_cache.clear()
+    from_disk = fetch_weather_data("USW00094728")
+    assert len(requested_headers) == 1
+    pd.testing.assert_frame_equal(from_disk, first.reset_index(drop=True), check_dtype=False)
+
+    monkeypatch.setattr("app.WEATHER_MAX_AGE_SECONDS", 0)
+    revalidated = fetch_weather_data("USW00094728")
+    assert requested_headers[-1]["If-None-Match"] == '"abc"'
+    assert len(revalidated) == 2
+
+
+def test_fetch_weather_data_syncs_appended_rows_with_range_requests(monkeypatch):
+    upstream = {"body": "".join(f"USW00094728,202301{day:02d},TMAX,{day},,,S,\n" for day in range(1, 29)).encode()}
+    requests_seen = []
+
+    def mock_http_get(url, headers=None, stream=False):
+        headers = headers or {}
+        requests_seen.append(headers)
+        body = upstream["body"]
+        if "Range" in headers and not upstream.get("ignore_range"):
+            start = int(headers["Range"][len("bytes="):-1])
+            response = MockResponse(206, "", {"Content-Range": f"bytes {start}-{len(body) - 1}/{len(body)}"})
+            response.content = body[start:]
+            return response
+        response = MockResponse(200, "")
+        response.content = body
+        return response
+
+    monkeypatch.setattr("app.http_get", mock_http_get)
+    monkeypatch.setattr("app.WEATHER_MAX_AGE_SECONDS", 0)
+    assert len(fetch_weather_data("USW00094728")) == 28
+
+    # New days are appended and yesterday's value corrected in place.
+    upstream["body"] = upstream["body"].replace(b"20230128,TMAX,28", b"20230128,TMAX,99") + (
+        b"USW00094728,20230129,TMAX,29,,,S,\nUSW00094728,20230129,TMIN,-5,,,S,\n"
+    )
+    synced = fetch_weather_data("USW00094728")
+    assert requests_seen[-1]["Range"].startswith("bytes=")
+    assert len(synced) == 30
+    assert synced["VALUE"].iloc[-3:].tolist() == [99, 29, -5]
+    sys.modules["app"].weather_cache.clear()
+    pd.testing.assert_frame_equal(fetch_weather_data("USW00094728"), synced, check_dtype=False)
+
+    # A rewritten file fails the tail check and is downloaded in full.
+    upstream["body"] = b"USW00094728,20240101,TMIN,1,,,S,\n" * 40
+    rewritten = fetch_weather_data("USW00094728")
+    assert "Range" not in requests_seen[-1]
+    assert rewritten["DATE"].dt.year.unique().tolist() == [2024]
+
+    upstream["ignore_range"] = True
+    upstream["body"] += b"USW00094728,20240102,TMIN,2,,,S,\n"
+    assert len(fetch_weather_data("USW00094728")) == 41
+    assert "Range" in requests_seen[-1]
+
+
+def test_weather_cache_evicts_least_recently_used():
+    from app import WeatherCache
+    frame = pd.DataFrame({"VALUE": np.zeros(100)})
+    size = int(frame.memory_usage(deep=True).sum())
+    cache = WeatherCache(max_bytes=2 * size)
+    cache.put("A", frame, {})
+    cache.put("B", frame, {})
+    cache.get("A")
+    cache.put("C", frame, {})
+    assert list(cache.entries) == ["A", "C"]
+    assert cache.size == 2 * size
+
+
+def test_concurrent_fetch_weather_data_is_coalesced(monkeypatch):
+    import threading
+    import time
+    mock_csv = "USW00094728,20230101,TMAX,30,,,S,\n"
+    release = threading.Event()
+    urls = []
+
+    def mock_requests_get(url, *args, **kwargs):
+        urls.append(url)
+        release.wait(5)
+
+        return MockResponse(200, mock_csv)
+
+    monkeypatch.setattr("app.http_get", mock_requests_get)
+    results = []
+    threads = [threading.Thread(target=lambda: results.append(fetch_weather_data("USW00094728"))) for _ in range(5)]
+    for thread in threads:
+        thread.start()
+    while not urls:
+        time.sleep(0.001)
+    release.set()
+    for thread in threads:
+        thread.join(5)
+
+    assert len(urls) == 1
+    assert len(results) == 5
+    assert all(result is results[0] for result in results)
+
+
+def test_single_flight_propagates_errors_to_all_callers():
+    import threading
+    import time
+    from app import SingleFlight
+
+    flight = SingleFlight()
+    release = threading.Event()
+    calls = []
+    errors = []
+
+    def fail():
+        calls.append(1)
+        release.wait(5)
+        raise ValueError("boom")
+
+    def call():
+        try:
+            flight.do("key", fail)
+        except ValueError as e:
+            errors.append(e)
+
+    threads = [threading.Thread(target=call) for _ in range(5)]
+    for thread in threads:
+        thread.start()
+    while not calls:
+        time.sleep(0.001)
+    # Give the other callers time to queue up behind the running call.
+    time.sleep(0.05)
+    release.set()
+    for thread in threads:
+        thread.join(5)
+
+    assert len(calls) == 1
+    assert len(errors) == 5
+    assert all(error is errors[0] for error in errors)
+
+
+def test_parse_ghcnd_dly_from_string_masks_invalid_days_and_values():
+    def dly_line(year_month, element, fields):
+        return "USW00094728" + year_month + element + "".join(f"{field:>5}   " for field in fields)
+
+    february = dly_line("202302", "TMIN", [str(day) for day in range(1, 32)])
+    leap_february = dly_line("202402", "TMAX", ["-9999"] * 28 + ["-12", "5", "6"])
+    garbage = dly_line("2023XX", "TMAX", ["1"] * 31)
+    data = "\r\n".join([february, leap_february, garbage, "too short"])
+
+    df = parse_ghcnd_dly_from_string(data)
+    assert len(df) == 29
+    assert df["DATE"].max() == pd.Timestamp(2024, 2, 29)
+    assert df.iloc[-1]["VALUE"] == -12
+    assert list(df[df["ELEMENT"] == "TMIN"]["VALUE"]) == list(range(1, 29))
+
+
+def test_parse_ascii_ints_matches_int():
+    from app import parse_ascii_ints
+    fields = ["   10", "-9999", "  +5 ", " 1 2 ", " - 5 ", "     ", "  5- ", "00042", "x1234"]
+    chars = np.frombuffer("".join(fields).encode("ascii"), dtype=np.uint8).reshape(len(fields), 5)
+    values, valid = parse_ascii_ints(chars)
+    for field, value, ok in zip(fields, values, valid):
+        try:
+            expected = int(field)
+        except ValueError:
+            assert not ok
+        else:
+            assert ok and value == expected
+
+
+def test_parse_ghcnd_csv_stream_filters_elements_and_years():
+    from app import parse_ghcnd_csv_stream
+    data = (
+        "USW00094728,19891231,TMAX,30,,,S,\n"
+        "USW00094728,19900101,TMAX,25,,,S,\n"
+        "USW00094728,19900101,PRCP,5,,,S,\n"
+        "USW00094728,19950615,TMIN,-9999,,,S,\n"
+        "USW00094728,20001231,TMIN,-12,,,S,\n"
+        "USW00094728,20010101,TMIN,7,,,S,\n"
+    ).encode("utf-8")
+    chunks = [data[start:start + 7] for start in range(0, len(data), 7)]
+
+    df = parse_ghcnd_csv_stream(chunks, ["TMIN", "TMAX"], 1990, 2000)
+    assert list(df["ELEMENT"]) == ["TMAX", "TMIN"]
+    assert list(df["VALUE"]) == [25, -12]
+    assert list(df["DATE"]) == [pd.Timestamp(1990, 1, 1), pd.Timestamp(2000, 12, 31)]
+
+
+def test_parse_ghcnd_csv_drops_impossible_calendar_dates():
+    df = parse_ghcnd_csv_from_string(
+        "USW00094728,20200230,TMIN,5,,,S,\n"
+        "USW00094728,20201301,TMIN,6,,,S,\n"
+        "USW00094728,20200229,TMAX,7,,,S,\n"
+    )
+    assert list(df["DATE"]) == [pd.Timestamp(2020, 2, 29)]
+    assert list(df["ELEMENT"]) == ["TMAX"]
+    assert list(df["VALUE"]) == [7]
+
+
+def test_get_weather_data_drops_only_malformed_rows_and_rejects_other_elements(monkeypatch, client):
+    mock_csv = (
+        "USW00094728,20200101,TMAX,abc,,,S,\n"
+        "USW00094728,2020010x,TMIN,3,,,S,\n"
+        "USW00094728,20200102,TMIN,5,,,S,\n"
+    )
+    monkeypatch.setattr("app.http_get", lambda url, *args, **kwargs: MockResponse(200, mock_csv))
+    response = client.get("/get_weather_data?station_id=USW00094728")
+    assert response.status_code == 200
+    assert [(record["ELEMENT"], record["VALUE"]) for record in response.json] == [("TMIN", 5)]
+
+    response = client.get("/get_weather_data?station_id=USW00094728&elements=PRCP")
+    assert response.status_code == 400
+    assert "PRCP" in response.json["error"]
+
+
+def test_year_range_requests_on_unparseable_weather_data_return_404(monkeypatch, client):
+    assert select_weather_data(pd.DataFrame(), 2000, 2001).empty
+    # Nine fields where the CSV has eight make read_csv fail outright.
+    monkeypatch.setattr("app.http_get", lambda url, *args, **kwargs: MockResponse(200, "A,1,2,3,4,5,6,7,8\n"))
+    for url in (
+        "/get_weather_data?station_id=USW00094728&start_year=2000&end_year=2001",
+        "/get_weather_summary?station_id=USW00094728&latitude=40&start_year=2000&end_year=2001",
+    ):
+        assert client.get(url).status_code == 404
+
+
+def test_fetch_weather_data_keeps_only_temperature_elements(monkeypatch):
+    mock_csv = "USW00094728,20230101,TMAX,30,,,S,\nUSW00094728,20230101,PRCP,3,,,S,\nUSW00094728,20230101,TMIN,10,,,S,\n"
+
+    def mock_requests_get(url, *args, **kwargs):
+        assert kwargs.get("stream")
+        return MockResponse(200, mock_csv)
+
+    monkeypatch.setattr("app.http_get", mock_requests_get)
+    weather_data = fetch_weather_data("USW00094728")
+    assert list(weather_data["ELEMENT"]) == ["TMAX", "TMIN"]
+
+
+def test_get_weather_summary_aggregates_by_year_and_season(monkeypatch, client):
+    weather_data = pd.DataFrame({
+        "DATE": pd.to_datetime(["2019-12-15", "2020-01-15", "2020-06-15", "2020-12-15", "2020-01-15"]),
+        "ELEMENT": ["TMIN", "TMIN", "TMIN", "TMIN", "TMAX"],
+        "VALUE": [10, 20, 30, 40, 150],
+    })
+    monkeypatch.setattr("app.fetch_remote_weather_data", lambda station_id, **filters: select_weather_data(weather_data, **filters))
+
+    response = client.get("/get_weather_summary?station_id=X&start_year=2019&end_year=2020&latitude=52.5")
+    assert response.status_code == 200
+    summary = response.get_json()
+    assert summary["annualTmin"] == [{"year": 2019, "value": 1.0}, {"year": 2020, "value": 3.0}]
+    assert summary["annualTmax"] == [{"year": 2020, "value": 15.0}]
+    assert summary["seasonalTmin"] == [
+        {"season": "Winter", "year": 2020, "value": 1.5},
+        {"season": "Summer", "year": 2020, "value": 3.0},
+    ]
+
+    response = client.get("/get_weather_summary?station_id=X&start_year=2019&end_year=2020&latitude=-33.9")
+    summary = response.get_json()
+    assert summary["seasonalTmin"] == [
+        {"season": "Summer", "year": 2019, "value": 1.0},
+        {"season": "Summer", "year": 2020, "value": 3.0},
+        {"season": "Winter", "year": 2020, "value": 3.0},
+    ]
+
+
+def test_get_weather_summary_ignores_rows_without_a_date(monkeypatch, client):
+    weather_data = pd.DataFrame({
+        "DATE": pd.to_datetime(["2020-01-15", None]),
+        "ELEMENT": ["TMIN", "TMIN"],
+        "VALUE": [20, 50],
+    })
+    monkeypatch.setattr("app.fetch_remote_weather_data", lambda station_id, **filters: weather_data)
+    monkeypatch.setattr("app.lookup_climatology_summary", lambda *args: None)
+
+    response = client.get("/get_weather_summary?station_id=X&latitude=52.5")
+    assert response.status_code == 200
+    assert response.get_json()["annualTmin"] == [{"year": 2020, "value": 2.0}]
+
+
+def test_get_weather_summary_missing_param(client):
+    response = client.get("/get_weather_summary")
+    assert response.status_code == 400
+
+
+def test_http_client_retries_and_decompresses_against_local_server(monkeypatch):
+    import gzip
+    import threading
+    from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+    body = gzip.compress(b"USW00094728,20230101,TMAX,30,,,S,\n")
+    seen = []
+
+    class Handler(BaseHTTPRequestHandler):
+        def do_GET(self):
+            seen.append((self.path, self.headers.get("Accept-Encoding")))
+            if len(seen) == 1:
+                self.send_response(503)
+                self.send_header("Content-Length", "0")
+                self.end_headers()
+                return
+            self.send_response(200)
+            self.send_header("Content-Encoding", "gzip")
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def log_message(self, *args):
+            pass
+
+    server = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    try:
+        monkeypatch.setattr("app.GHCN_BASE_URL", f"http://127.0.0.1:{server.server_port}/")
+        weather_data = fetch_weather_data("USW00094728")
+    finally:
+        server.shutdown()
+        server.server_close()
+
+    assert [path for path, _ in seen] == ["/by_station/USW00094728.csv"] * 2
+    assert "gzip" in seen[1][1]
+    assert list(weather_data["VALUE"]) == [30]
+
+
+def test_get_weather_data_times_out_on_slow_upstream(monkeypatch, client):
+    import threading
+    release = threading.Event()
+
+    def slow_fetch_weather_data(station_id, **filters):
+        release.wait(5)
+        return None
+
+    monkeypatch.setattr("app.fetch_remote_weather_data", slow_fetch_weather_data)
+    monkeypatch.setattr("app.UPSTREAM_TIMEOUT_SECONDS", 0.05)
+    try:
+        response = client.get("/get_weather_data?station_id=SLOW")
+        assert response.status_code == 504
+        assert client.get("/preload_status").status_code == 200
+    finally:
+        release.set()
+
+
+def test_cached_stations_are_served_while_downloads_fill_the_upstream_pool(monkeypatch, client):
+    import threading
+    import time
+    from concurrent.futures import ThreadPoolExecutor
+    from app import store_cached_weather
+    release = threading.Event()
+
+    def slow_download(station_id, **filters):
+        release.wait(5)
+        return None
+
+    pool = ThreadPoolExecutor(max_workers=2)
+    monkeypatch.setattr("app.upstream_executor", pool)
+    monkeypatch.setattr("app.fetch_remote_weather_data", slow_download)
+    monkeypatch.setattr("app.UPSTREAM_TIMEOUT_SECONDS", 0.2)
+    store_cached_weather("CACHED", pd.DataFrame({
+        "DATE": pd.to_datetime(["2020-01-01"]), "ELEMENT": ["TMAX"], "VALUE": [25],
+    }), {"checked_at": time.time()})
+    try:
+        for station_id in ("SLOW1", "SLOW2"):
+            assert client.get(f"/get_weather_data?station_id={station_id}").status_code == 504
+        response = client.get("/get_weather_data?station_id=CACHED")
+        assert response.status_code == 200
+        assert [record["VALUE"] for record in response.get_json()] == [25]
+    finally:
+        release.set()
+        pool.shutdown()
+
+
+def test_get_station_coverage_batches_inventory_and_cached_counts(monkeypatch, client):
+    from app import StationIndex, store_cached_weather
+    stations = pd.DataFrame({"ID": ["A", "B", "C"], "LATITUDE": [0.0, 0.1, 0.2], "LONGITUDE": [0.0, 0.0, 0.0]})
+    inventory = pd.DataFrame({
+        "ID": ["A", "A", "B", "B", "C", "C"],
+        "ELEMENT": ["TMIN", "TMAX", "TMIN", "TMAX", "TMIN", "TMAX"],
+        "FIRSTYEAR": [1900, 1950, 1980, 1970, 1900, 1900],
+        "LASTYEAR": [2020, 2010, 2024, 2024, 2024, 2024],
+    })
+    monkeypatch.setattr("app.load_coverage_index", lambda: StationIndex(stations, inventory))
+    # C's inventory spans the range, but its cached series has a gap there.
+    store_cached_weather("C", pd.DataFrame({
+        "DATE": pd.to_datetime(["1950-01-01", "2010-01-01"]),
+        "ELEMENT": ["TMIN", "TMAX"],
+        "VALUE": [1, 2],
+    }), {"fetched_at": 0})
+
+    response = client.post("/get_station_coverage", json={"station_ids": ["A", "B", "C", "Z"], "start_year": 2021, "end_year": 2022})
+    assert response.status_code == 200
+    coverage = {entry["ID"]: entry for entry in response.get_json()}
+    assert [coverage[station_id]["covered"] for station_id in "ABCZ"] == [False, True, False, False]
+    assert coverage["A"]["elements"]["TMIN"] == {"first_year": 1900, "last_year": 2020, "records": None}
+    assert coverage["C"]["elements"]["TMIN"]["records"] == 0
+    assert coverage["Z"]["elements"]["TMAX"]["first_year"] is None
+
+    response = client.get("/get_station_coverage?station_ids=A,C&start_year=1950&end_year=1950")
+    assert [entry["covered"] for entry in response.get_json()] == [True, True]
+
+
+def test_get_station_coverage_rejects_missing_and_oversized_batches(monkeypatch, client):
+    monkeypatch.setattr("app.MAX_COVERAGE_STATIONS", 2)
+    assert client.get("/get_station_coverage?start_year=2000&end_year=2001").status_code == 400
+    assert client.get("/get_station_coverage?station_ids=A,B,C&start_year=2000&end_year=2001").status_code == 400
+    assert client.get("/get_station_coverage?station_ids=A").status_code == 400
+    assert client.post("/get_station_coverage", json=["USW00094728"]).status_code == 400
+    assert client.post("/get_station_coverage", json="USW00094728").status_code == 400
+
+
+def test_get_weather_summaries_aggregates_stations_in_worker_processes(monkeypatch, client):
+    from app import aggregate_weather_data
+    frames = {
+        "NORTH": pd.DataFrame({
+            "DATE": pd.to_datetime(["2019-12-15", "2020-01-15", "2020-06-15"]),
+            "ELEMENT": ["TMIN", "TMIN", "TMAX"],
+            "VALUE": [10, 20, 300],
+        }),
+        "SOUTH": pd.DataFrame({
+            "DATE": pd.to_datetime(["2018-01-15", "2020-01-15", "2020-07-15"]),
+            "ELEMENT": ["TMIN", "TMIN", "TMIN"],
+            "VALUE": [-50, 50, 70],
+        }),
+    }
+    monkeypatch.setattr("app.fetch_remote_weather_data", lambda station_id, **filters: select_weather_data(frames.get(station_id), **filters))
+    monkeypatch.setattr("app.cached_stations", pd.DataFrame({
+        "ID": ["NORTH", "SOUTH"], "LATITUDE": [52.5, -33.9], "LONGITUDE": [13.4, 18.4],
+    }))
+    monkeypatch.setattr("app.AGGREGATE_PROCESSES", 2)
+
+    response = client.get("/get_weather_summaries?station_ids=NORTH,SOUTH,MISSING&start_year=2019&end_year=2020")
+    assert response.status_code == 200
+    north, south, missing = response.get_json()
+    assert north == dict(ID="NORTH", latitude=52.5, **aggregate_weather_data(frames["NORTH"], True, 2020))
+    assert south["latitude"] == -33.9
+    assert south["annualTmin"] == [{"year": 2020, "value": 6.0}]
+    assert south["seasonalTmin"] == [
+        {"season": "Summer", "year": 2020, "value": 5.0},
+        {"season": "Winter", "year": 2020, "value": 7.0},
+    ]
+    assert missing == {"ID": "MISSING", "latitude": None, "error": "No data found for station MISSING"}
+
+
+def test_get_weather_summaries_rejects_missing_and_oversized_batches(monkeypatch, client):
+    monkeypatch.setattr("app.MAX_SUMMARY_STATIONS", 2)
+    assert client.get("/get_weather_summaries").status_code == 400
+    assert client.get("/get_weather_summaries?station_ids=A,B,C").status_code == 400
+
+
+def test_gunicorn_workers_split_the_cache_budget_and_aggregation_cores(monkeypatch):
+    import os
+    import app as app_module
+    monkeypatch.delattr(os, "sched_getaffinity", raising=False)
+    monkeypatch.setattr(os, "cpu_count", lambda: 4)
+    assert app_module.available_cpus() == 4
+
+    monkeypatch.delenv("GHCN_AGGREGATE_PROCESSES", raising=False)
+    monkeypatch.delenv("GHCN_WEATHER_CACHE_BYTES", raising=False)
+    monkeypatch.setattr("app.AGGREGATE_PROCESSES", 4)
+    monkeypatch.setattr(app_module.weather_cache, "max_bytes", app_module.weather_cache.max_bytes)
+    app_module.configure_worker(2)
+    assert app_module.AGGREGATE_PROCESSES == 2
+    assert app_module.weather_cache.max_bytes == app_module.WEATHER_CACHE_BYTES // 2
+    app_module.configure_worker(8)
+    assert app_module.AGGREGATE_PROCESSES == 1
+
+    monkeypatch.setenv("GHCN_AGGREGATE_PROCESSES", "3")
+    monkeypatch.setattr("app.AGGREGATE_PROCESSES", 3)
+    app_module.configure_worker(2)
+    assert app_module.AGGREGATE_PROCESSES == 3
+
+
+@pytest.fixture
+def weather_frame(monkeypatch):
+    frame = pd.DataFrame({
+        "DATE": pd.to_datetime(["2020-01-01", "2020-01-02", "2020-01-03"]),
+        "ELEMENT": ["TMIN", "TMAX", "TMIN"],
+        "VALUE": [-12, 31, 5],
+    })
+    monkeypatch.setattr("app.fetch_remote_weather_data", lambda station_id, **filters: select_weather_data(frame, **filters))
+    monkeypatch.setattr("app.RESPONSE_CHUNK_ROWS", 2)
+    return frame
+
+
+def test_get_weather_data_json_encodings_stream_in_slices(weather_frame, client):
+    import gzip
+    import json
+    response = client.get("/get_weather_data?station_id=X", headers={"Accept-Encoding": "gzip"})
+    assert response.headers["Content-Encoding"] == "gzip"
+    records = json.loads(gzip.decompress(response.data))
+    assert records[0] == {"DATE": 1577836800000, "ELEMENT": "TMIN", "VALUE": -12}
+    assert [record["DATE"] for record in records[1:]] == [1577923200000, 1578009600000]
+
+    response = client.get("/get_weather_data?station_id=X&format=columns")
+    assert response.get_json() == {
+        "DATE": ["2020-01-01", "2020-01-02", "2020-01-03"],
+        "ELEMENT": ["TMIN", "TMAX", "TMIN"],
+        "VALUE": [-12, 31, 5],
+    }
+
+    response = client.get("/get_weather_data?station_id=X", headers={"Accept": "application/x-ndjson"})
+    assert response.mimetype == "application/x-ndjson"
+    lines = [json.loads(line) for line in response.data.decode("utf-8").splitlines()]
+    assert lines[1] == {"DATE": "2020-01-02", "ELEMENT": "TMAX", "VALUE": 31}
+    assert len(lines) == 3
+
+    assert client.get("/get_weather_data?station_id=X&format=xml").status_code == 400
+
+
+def test_get_weather_data_arrow_stream(weather_frame, monkeypatch, client):
+    pa = pytest.importorskip("pyarrow")
+    response = client.get("/get_weather_data?station_id=X", headers={"Accept": "application/vnd.apache.arrow.stream"})
+    assert response.status_code == 200
+    table = pa.ipc.open_stream(response.data).read_all()
+    assert table.num_rows == 3
+    assert table.column("ELEMENT").to_pylist() == ["TMIN", "TMAX", "TMIN"]
+    assert table.column("VALUE").to_pylist() == [-12, 31, 5]
+
+    monkeypatch.setattr("app.pa", None)
+    assert client.get("/get_weather_data?station_id=X&format=arrow").status_code == 406
+
+
+def test_parse_ghcnd_dly_from_string_skips_lines_outside_year_range():
+    def dly_line(year, element, value):
+        return f"USW00094728{year}01{element}" + f"{value:5d}   " * 31 + "\n"
+
+    data = dly_line(1850, "TMAX", 10) + dly_line(1995, "TMIN", 20) + dly_line(1995, "PRCP", 30) + dly_line(2020, "TMAX", 40)
+    df = parse_ghcnd_dly_from_string(data, ["TMIN", "TMAX"], 1990, 2000)
+    assert set(df["DATE"].dt.year) == {1995}
+    assert set(df["ELEMENT"]) == {"TMIN"}
+    assert len(df) == 31
+
+
+def test_fetch_weather_data_reads_only_cached_year_partitions(monkeypatch):
+    import time
+    from app import store_cached_weather, weather_cache
+    data = pd.DataFrame({
+        "DATE": pd.to_datetime(["1850-06-01", "1995-01-01", "1995-01-02", "1999-07-01", "2020-01-01"]),
+        "ELEMENT": ["TMAX", "TMIN", "TMAX", "TMIN", "TMAX"],
+        "VALUE": [1, 2, 3, 4, 5],
+    })
+    store_cached_weather("USW00094728", data, {"checked_at": time.time()})
+    weather_cache.clear()
+
+    members = []
+    getitem = np.lib.npyio.NpzFile.__getitem__
+    monkeypatch.setattr(np.lib.npyio.NpzFile, "__getitem__", lambda self, key: members.append(key) or getitem(self, key))
+    monkeypatch.setattr("app.download_weather_data", lambda *args: pytest.fail("fresh cache must not be downloaded"))
+
+    df = fetch_weather_data("USW00094728", start_year=1990, end_year=2000, elements=["TMIN"])
+    assert list(df["VALUE"]) == [2, 4]
+    assert set(members) - {"meta", "element_values", "years", "empty"} == {"y1995", "y1999"}
+    assert weather_cache.get("USW00094728") is None
+
+    full = fetch_weather_data("USW00094728")
+    pd.testing.assert_frame_equal(full, data)
+    assert list(fetch_weather_data("USW00094728", start_year=2000, end_year=2030)["VALUE"]) == [5]
+
+
+def test_weather_cache_skips_undated_rows_and_rejects_malformed_files(cache_dir):
+    import time
+    from app import read_cached_weather, store_cached_weather
+    data = pd.DataFrame({
+        "DATE": pd.to_datetime(["2020-01-01", None]),
+        "ELEMENT": ["TMAX", "TMIN"],
+        "VALUE": [5, 6],
+    })
+    store_cached_weather("USW00094728", data, {"checked_at": time.time()})
+    stored, _ = read_cached_weather("USW00094728", 2020, 2020)
+    assert list(stored["VALUE"]) == [5]
+
+    (cache_dir / "weather" / "USW00094728.npz").write_bytes(b"not an npz file")
+    with pytest.raises(ValueError, match="malformed"):
+        read_cached_weather("USW00094728")
+
+
+def test_catalog_tables_are_compact_and_share_station_ids(client):
+    from app import StationIndex, parse_inventory_from_string, parse_stations_from_string, share_station_ids
+    stations = parse_stations_from_string(
+        "USW00094728  40.7789  -73.9692   39.6 NY NEW YORK CNTRL PK TWR\n"
+        "GME00127786  52.4631   13.3181   51.0    BERLIN-DAHLEM\n"
+        "ASN00066062 -33.8607  151.2050   39.0    SYDNEY (OBSERVATORY HILL)\n"
+    )
+    inventory_text = (
+        "USW00094728  40.7789  -73.9692 TMAX 1869 2024\n"
+        "USW00094728  40.7789  -73.9692 PRCP 1869 2024\n"
+        "USW00094728  40.7789  -73.9692 TMIN 1869 2024\n"
+        "ASN00066062 -33.8607  151.2050 TMIN 1859 2024\n"
+        "XXX00000000  10.0000   10.0000 TMIN 1900 2000\n"
+    )
+    inventory = parse_inventory_from_string(inventory_text)
+    assert stations["LATITUDE"].dtype == np.float32
+    assert inventory["FIRSTYEAR"].dtype == np.int16
+    assert list(inventory["ELEMENT"].cat.codes) == [1, 0, 0, 0]
+    assert inventory["ELEMENT"].cat.codes.dtype == np.int8
+
+    shared = share_station_ids(stations, inventory)
+    assert shared["ID"].cat.categories is stations["ID"].cat.categories
+    assert list(shared["ID"].cat.codes) == [0, 0, 2]
+
+    index = StationIndex(stations.iloc[[0, 2]], shared)
+    assert list(index.locate(["ASN00066062", "GME00127786", "USW00094728", "NOPE"])) == [1, -1, 0, -1]
+    assert list(index.first_year) == [1869, np.iinfo(np.int16).max]
+
+    catalog_bytes = client.get("/preload_status").get_json()["catalog_bytes"]
+    assert catalog_bytes["inventory"]["text"] == len(inventory_text)
+    assert catalog_bytes["inventory"]["compact"] > 0
+
+
+def test_refresh_catalog_swaps_in_changed_upstream_tables(monkeypatch):
+    from app import get_station_index, refresh_catalog
+    station_lines = [
+        "USW00094728  40.7789  -73.9692   39.6 NY NEW YORK CNTRL PK TWR\n",
+        "USW00014732  40.7794  -73.8803    3.4 NY NEW YORK LAGUARDIA AP\n",
+    ]
+    inventory = "".join(
+        f"{station_id}  40.7789  -73.9692 {element} 1900 2024\n"
+        for station_id in ("USW00094728", "USW00014732") for element in ("TMIN", "TMAX")
+    )
+    upstream = {"ghcnd-stations.txt": ("v1", station_lines[0]), "ghcnd-inventory.txt": ("v1", inventory)}
+    requests_made = []
+
+    def mock_requests_get(url, headers=None, stream=False):
+        filename = url.rsplit("/", 1)[-1]
+        etag, body = upstream[filename]
+        requests_made.append(filename)
+        if headers and headers.get("If-None-Match") == etag:
+            return MockResponse(304, "")
+        return MockResponse(200, body, {"ETag": etag})
+
+    monkeypatch.setattr("app.http_get", mock_requests_get)
+    monkeypatch.setattr("app.cached_stations", None)
+    monkeypatch.setattr("app.cached_inventory", None)
+    monkeypatch.setattr("app.station_index", None)
+    monkeypatch.setattr("app.CATALOG_REFRESH_SECONDS", 0)
+    old_stations = load_stations()
+    assert list(old_stations["ID"]) == ["USW00094728"]
+
+    assert refresh_catalog() is False
+    assert load_stations() is old_stations
+
+    upstream["ghcnd-stations.txt"] = ("v2", "".join(station_lines))
+    requests_made.clear()
+    assert refresh_catalog() is True
+    assert requests_made == ["ghcnd-stations.txt", "ghcnd-inventory.txt"]
+    new_stations = load_stations()
+    assert list(new_stations["ID"]) == ["USW00094728", "USW00014732"]
+    # A request that picked up the old frame before the swap gets the new index.
+    assert get_station_index(old_stations).stations is new_stations
+
+
+def test_benchmark_suite_reports_and_flags_regressions(tmp_path, capsys):
+    import importlib.util
+    import json
+    import os
+    spec = importlib.util.spec_from_file_location(
+        "benchmark_run", os.path.join(os.path.dirname(__file__), "..", "benchmarks", "run.py")
+    )
+    benchmark_run = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(benchmark_run)
+    http_get = sys.modules["app"].http_get
+
+    baseline = tmp_path / "baseline.json"
+    args = ["--scale", "0.001", "--repeat", "2", "--only", "parse_ghcnd_dly", "get_stations"]
+    assert benchmark_run.main(args + ["--save", str(baseline)]) == 0
+    results = json.loads(baseline.read_text())["results"]
+    assert set(results) == {"parse_ghcnd_dly", "get_stations"}
+    assert results["get_stations"]["p99"] >= results["get_stations"]["p50"] > 0
+    assert sys.modules["app"].http_get is http_get
+
+    recorded = json.loads(baseline.read_text())
+    recorded["results"]["parse_ghcnd_dly"]["p50"] = 1e-9
+    baseline.write_text(json.dumps(recorded))
+    assert benchmark_run.main(args + ["--baseline", str(baseline)]) == 1
+    assert "parse_ghcnd_dly: p50" in capsys.readouterr().out
+
+
+def test_preload_serves_stations_before_inventory_finishes(monkeypatch, client):
+    import threading
+    import time
+    station_lines = (
+        "USW00094728  40.7789  -73.9692   39.6 NY NEW YORK CNTRL PK TWR\n"
+        "USC00305796  40.6000  -73.9000    5.0 NY NO TEMPERATURE STATION\n"
+    )
+    inventory_lines = (
+        "USW00094728  40.7789  -73.9692 TMIN 1869 2024\n"
+        "USW00094728  40.7789  -73.9692 TMAX 1869 2024\n"
+    )
+    inventory_requested = threading.Event()
+    release_inventory = threading.Event()
+
+    def mock_http_get(url, headers=None, stream=False):
+        if url.endswith("ghcnd-inventory.txt"):
+            inventory_requested.set()
+            release_inventory.wait(5)
+            return MockResponse(200, inventory_lines)
+        return MockResponse(200, station_lines)
+
+    monkeypatch.setattr("app.http_get", mock_http_get)
+    monkeypatch.setattr("app.cached_stations", None)
+    monkeypatch.setattr("app.cached_inventory", None)
+    monkeypatch.setattr("app.station_index", None)
+    monkeypatch.setattr("app.preload_started", False)
+    monkeypatch.setattr("app.preloading_complete", False)
+    monkeypatch.setattr("app.preload_stages", {name: {"state": "pending", "seconds": None, "rows": None}
+                                               for name in ("stations", "inventory", "catalog")})
+    monkeypatch.setattr("app.refresh_catalog_periodically", lambda: None)
+
+    def wait_for(stage, state):
+        for _ in range(500):
+            stages = client.get("/preload_status").get_json()["stages"]
+            if stages[stage]["state"] == state:
+                return stages
+            time.sleep(0.01)
+        raise AssertionError(f"{stage} never reached {state}")
+
+    query = "/get_stations?latitude=40.7&longitude=-73.9&radius_km=50&station_count=10&start_year=1900&end_year=2000"
+    assert client.get("/").status_code == 200
+    assert inventory_requested.wait(5)
+    stages = wait_for("stations", "done")
+    assert stages["stations"]["rows"] == 2
+    assert stages["inventory"]["state"] == "running"
+
+    response = client.get(query)
+    assert response.status_code == 200
+    assert response.headers["X-Catalog-Stage"] == "stations"
+    assert len(response.get_json()) == 2
+
+    release_inventory.set()
+    wait_for("catalog", "done")
+    for _ in range(500):
+        if client.get("/preload_status").get_json()["status"] == "done":
+            break
+        time.sleep(0.01)
+    response = client.get(query)
+    assert "X-Catalog-Stage" not in response.headers
+    assert [station["ID"] for station in response.get_json()] == ["USW00094728"]
+
+
+@pytest.mark.skipif(sys.platform == "win32", reason="needs os.fork")
+def test_catalog_snapshot_in_master_leaves_forked_workers_able_to_load(monkeypatch):
+    import os
+    import time
+    import app as app_module
+    station_lines = "USW00094728  40.7789  -73.9692   39.6 NY NEW YORK CNTRL PK TWR\n"
+    inventory_lines = (
+        "USW00094728  40.7789  -73.9692 TMIN 1869 2024\n"
+        "USW00094728  40.7789  -73.9692 TMAX 1869 2024\n"
+    )
+    inventory_status = [503]
+
+    def mock_http_get(url, headers=None, stream=False):
+        if url.endswith("ghcnd-inventory.txt"):
+            return MockResponse(inventory_status[0], inventory_lines if inventory_status[0] == 200 else "")
+        return MockResponse(200, station_lines)
+
+    monkeypatch.setattr("app.http_get", mock_http_get)
+    for name in ("cached_stations", "cached_inventory", "station_index", "retired_stations"):
+        monkeypatch.setattr(f"app.{name}", None)
+    monkeypatch.setattr("app.preload_stages", {name: {"state": "pending", "seconds": None, "rows": None}
+                                               for name in ("stations", "inventory", "catalog")})
+
+    # The inventory is down while the master builds the catalog: only a
+    # stations-only index exists, so there is no snapshot to report.
+    assert app_module.build_catalog_snapshot() is False
+
+    inventory_status[0] = 200
+    pid = os.fork()
+    if pid == 0:
+        try:
+            stations = app_module.load_stations()
+            os._exit(0 if stations is not None and app_module.station_index.first_year is not None else 3)
+        finally:
+            os._exit(4)
+    for _ in range(500):
+        done, status = os.waitpid(pid, os.WNOHANG)
+        if done:
+            break
+        time.sleep(0.01)
+    else:
+        os.kill(pid, 9)
+        os.waitpid(pid, 0)
+        raise AssertionError("the forked worker hung loading the catalog")
+    assert os.waitstatus_to_exitcode(status) == 0
+
+    assert app_module.build_catalog_snapshot() is True
+
+
+def test_ingest_mirror_serves_weather_data_without_network(monkeypatch, tmp_path, client):
+    import tarfile
+    from app import ingest_mirror, parse_ghcnd_dly_from_string
+
+    def dly_line(station_id, year, month, element, value):
+        return f"{station_id}{year}{month:02d}{element}" + f"{value:5d}   " * 31 + "\n"
+
+    sources = {
+        "USW00094728": "".join(dly_line("USW00094728", year, month, element, year - 2000 + month)
+                               for year in (2001, 2002, 2003) for month in (1, 2) for element in ("TMAX", "PRCP", "TMIN")),
+        "GME00127786": dly_line("GME00127786", 1990, 7, "TMAX", 250),
+    }
+    dly_dir = tmp_path / "ghcnd_all"
+    dly_dir.mkdir()
+    for station_id, text in sources.items():
+        (dly_dir / f"{station_id}.dly").write_text(text)
+    archive = tmp_path / "ghcnd_all.tar.gz"
+    with tarfile.open(archive, "w:gz") as tar:
+        tar.add(dly_dir, arcname="ghcnd_all")
+
+    assert ingest_mirror(str(dly_dir), processes=2) == (2, 3 * (31 + 28) * 2 + 31)
+    assert ingest_mirror(str(archive), processes=0)[0] == 2
+
+    def no_network(*args, **kwargs):
+        raise AssertionError("mirrored stations must not be fetched")
+
+    monkeypatch.setattr("app.http_get", no_network)
+    year = fetch_weather_data("USW00094728", start_year=2002, end_year=2002)
+    assert len(year) == (31 + 28) * 2
+    values = year["VALUE"].to_numpy()
+    while values.base is not None and not isinstance(values, np.memmap):
+        values = values.base
+    assert isinstance(values, np.memmap)
+    mirrored = fetch_weather_data("USW00094728", start_year=2002, end_year=2002, elements=["TMIN"])
+    expected = parse_ghcnd_dly_from_string(sources["USW00094728"], ["TMIN"], 2002, 2002)
+    assert sorted(zip(mirrored["DATE"], mirrored["VALUE"])) == sorted(zip(expected["DATE"], expected["VALUE"]))
+    assert fetch_weather_data("USW00094728", start_year=2010).empty
+
+    response = client.get("/get_weather_data?station_id=GME00127786")
+    assert response.status_code == 200
+    assert len(response.get_json()) == 31
+
+
+def test_climatology_table_skips_rows_without_a_date():
+    from app import build_climatology
+    table = build_climatology(pd.DataFrame({
+        "DATE": pd.to_datetime(["2020-05-01", None]),
+        "ELEMENT": ["TMIN", "TMIN"],
+        "VALUE": [5, 7],
+    }))
+    assert table.tolist() == [(0, 2020, 5, 5, 1)]
+
+
+def test_climatology_table_matches_aggregation_and_updates_incrementally(monkeypatch, client):
+    from app import aggregate_weather_data, build_climatology, climatology_summary
+    rng = np.random.default_rng(3)
+    dates = pd.date_range("1998-11-01", "2003-02-28", freq="D").repeat(2)
+    data = pd.DataFrame({
+        "DATE": dates,
+        "ELEMENT": np.tile(["TMIN", "TMAX"], len(dates) // 2).astype(object),
+        "VALUE": rng.integers(-300, 400, len(dates)),
+    })
+    data = data.iloc[rng.permutation(len(data))[: len(data) - 50]]
+    table = build_climatology(data)
+    for latitude_positive in (True, False):
+        for start_year, end_year in ((None, None), (1999, 2001), (None, 2000)):
+            rows = data if start_year is None else select_weather_data(data, start_year, end_year)
+            expected = aggregate_weather_data(rows, latitude_positive, end_year)
+            summary = climatology_summary(table, latitude_positive, start_year, end_year)
+            for key, entries in expected.items():
+                assert [{**entry, "value": pytest.approx(entry["value"])} for entry in entries] == summary[key]
+
+    older = data[data["DATE"] < "2002-06-01"]
+    incremental = build_climatology(data, build_climatology(older), since_year=2002)
+    assert incremental.tobytes() == table.tobytes()
+
+    mock_csv = "".join(f"USW00094728,{date:%Y%m%d},{element},{value},,,S,\n" for date, element, value in data.itertuples(index=False))
+    monkeypatch.setattr("app.http_get", lambda url, headers=None, stream=False: MockResponse(200, mock_csv))
+    fetch_weather_data("USW00094728")
+
+    def no_network(*args, **kwargs):
+        raise AssertionError("the summary must come from the climatology table")
+
+    monkeypatch.setattr("app.http_get", no_network)
+    monkeypatch.setattr("app.fetch_remote_weather_data", no_network)
+    response = client.get("/get_weather_summary?station_id=USW00094728&latitude=40&start_year=1999&end_year=2001")
+    assert response.status_code == 200
+    assert response.get_json()["annualTmax"][0]["year"] == 1999
+
+
+def test_get_stations_and_weather_data_are_cached_with_etags(monkeypatch, weather_frame, client):
+    from app import StationIndex, install_catalog, parse_inventory_from_string, parse_stations_from_string, build_catalog
+    stations = parse_stations_from_string("USW00094728  40.7789  -73.9692   39.6 NY NEW YORK CNTRL PK TWR\n")
+    inventory = parse_inventory_from_string(
+        "USW00094728  40.7789  -73.9692 TMIN 1869 2024\n"
+        "USW00094728  40.7789  -73.9692 TMAX 1869 2024\n"
+    )
+    monkeypatch.setattr("app.preload_running", False)
+    stations.attrs["fetched_at"] = 1700000000.0
+    install_catalog(build_catalog(stations, inventory))
+    queries = []
+    query_nearest = StationIndex.query_nearest
+    monkeypatch.setattr(StationIndex, "query_nearest", lambda self, *args: queries.append(args) or query_nearest(self, *args))
+
+    url = "/get_stations?longitude=-73.97&radius_km=50&station_count=5&start_year=1990&end_year=2000&latitude="
+    first = client.get(url + "40.7801")
+    second = client.get(url + "40.7799")
+    assert first.status_code == second.status_code == 200
+    assert len(queries) == 1
+    assert first.get_data() == second.get_data()
+    assert first.headers["ETag"] == second.headers["ETag"]
+    assert "max-age" in first.headers["Cache-Control"]
+    assert first.headers["Last-Modified"] == "Tue, 14 Nov 2023 22:13:20 GMT"
+
+    revalidated = client.get(url + "40.78", headers={"If-None-Match": first.headers["ETag"]})
+    assert revalidated.status_code == 304
+    assert revalidated.get_data() == b""
+
+    install_catalog(build_catalog(stations, inventory))
+    assert client.get(url + "40.78").status_code == 200
+    assert len(queries) == 2
+
+    weather_url = "/get_weather_data?station_id=USW00094728&start_year=2020&end_year=2020"
+    plain = client.get(weather_url)
+    gzipped = client.get(weather_url, headers={"Accept-Encoding": "gzip"})
+    assert plain.headers["ETag"] != gzipped.headers["ETag"]
+    not_modified = client.get(weather_url, headers={"If-None-Match": plain.headers["ETag"]})
+    assert not_modified.status_code == 304
+    assert not_modified.headers["Vary"] == "Accept, Accept-Encoding"
+    assert client.get(weather_url + "&format=columns", headers={"If-None-Match": plain.headers["ETag"]}).status_code == 200
+
+def test_metrics_and_server_timing_report_hot_path_stages(monkeypatch, client):
+    mock_csv = (
+        "USW00094728,20190101,TMAX,25,M,X,S,0700\n"
+        "USW00094728,20200101,TMIN,5,M,X,S,0700\n"
+    )
+    monkeypatch.setattr("app.http_get", lambda url, *args, **kwargs: MockResponse(200, mock_csv))
+    url = "/get_weather_data?station_id=USW00094728&start_year=2020&end_year=2020"
+
+    profiled = client.get(url, headers={"X-Profile": "1"})
+    assert profiled.status_code == 200
+    profiled.get_data()
+    timing = profiled.headers["Server-Timing"]
+    for stage in ("download", "parse", "filter", "total"):
+        assert f"{stage};dur=" in timing
+    assert "Server-Timing" not in client.get(url).headers
+
+    text = client.get("/metrics").get_data(as_text=True)
+    assert 'ghcn_stage_seconds_bucket{source="csv",stage="download",le="+Inf"}' in text
+    assert 'ghcn_stage_seconds_count{source="records",stage="serialize"}' in text
+    assert 'ghcn_cache_requests_total{cache="weather",result="hit"}' in text
+    assert 'ghcn_cache_requests_total{cache="weather",result="miss"}' in text
+    assert 'ghcn_download_bytes_total{source="csv"}' in text
+    assert "# TYPE ghcn_request_seconds histogram" in text
+
+
+def test_get_stations_caches_responses_under_the_generation_of_their_index(monkeypatch, client):
+    import app as app_module
+    from app import install_catalog, parse_inventory_from_string, parse_stations_from_string, build_catalog
+    stations = parse_stations_from_string("USW00094728  40.7789  -73.9692   39.6 NY NEW YORK CNTRL PK TWR\n")
+    inventory = parse_inventory_from_string(
+        "USW00094728  40.7789  -73.9692 TMIN 1869 2024\n"
+        "USW00094728  40.7789  -73.9692 TMAX 1869 2024\n"
+    )
+    monkeypatch.setattr("app.preload_running", False)
+    install_catalog(build_catalog(stations, inventory))
+
+    # A refresh swaps the catalog while the request is looking up its index.
+    def refreshed_index():
+        install_catalog(build_catalog(stations, inventory))
+        return app_module.station_index
+
+    monkeypatch.setattr("app.load_coverage_index", refreshed_index)
+    response = client.get("/get_stations?latitude=40.78&longitude=-73.97&radius_km=50&station_count=5&start_year=1990&end_year=2000")
+    assert response.status_code == 200
+    assert [key[0] for key in app_module.stations_response_cache.entries] == [app_module.catalog_generation]